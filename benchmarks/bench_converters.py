@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark de la conversión a BSON de sync_mysql_mongo: compara convert_data (recursivo,
+una cadena de isinstance por valor) con el conversor compilado desde los tipos de DESCRIBE,
+aplicado fila por fila y por lote (columna por columna). No requiere bases de datos: las filas
+se generan con los tipos que devuelve mysql-connector.
+
+    python benchmarks/bench_converters.py --rows 200000 --columns 40
+"""
+import os
+import sys
+import time
+import argparse
+from decimal import Decimal
+from datetime import datetime, date, timedelta
+from typing import List, Dict, Any, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sync_mysql_mongo import convert_data, compile_converter
+
+# Tipos de columna que se repiten para armar tablas anchas: (tipo DESCRIBE, valor de ejemplo)
+COLUMN_TYPES = [
+    ("int(11)", lambda n: n),
+    ("varchar(64)", lambda n: f"valor-{n}"),
+    ("decimal(12,2)", lambda n: Decimal(n) / 100),
+    ("datetime", lambda n: datetime(2024, 1, 1) + timedelta(seconds=n)),
+    ("date", lambda n: date(2024, 1, 1) + timedelta(days=n % 365)),
+    ("double", lambda n: n / 3),
+    ("time", lambda n: timedelta(seconds=n % 86400)),
+    ("text", lambda n: None if n % 5 == 0 else "texto " * 4),
+]
+
+def build_table(columns: int, rows: int):
+    """Devuelve las columnas (como DESCRIBE) y las filas (como un cursor dictionary=True)"""
+    described = [{"Field": f"c{index:03d}", "Type": COLUMN_TYPES[index % len(COLUMN_TYPES)][0]}
+                 for index in range(columns)]
+    generators = [COLUMN_TYPES[index % len(COLUMN_TYPES)][1] for index in range(columns)]
+    data = [{col["Field"]: generate(n) for col, generate in zip(described, generators)} for n in range(rows)]
+    return described, data
+
+def measure(convert: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]], rows: List[Dict[str, Any]],
+            batch_size: int, repeat: int) -> float:
+    """Mejor tiempo (s) de convertir todas las filas en lotes de batch_size"""
+    best = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        for start in range(0, len(rows), batch_size):
+            convert(rows[start:start + batch_size])
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara convert_data con el conversor compilado por esquema.")
+    parser.add_argument("--rows", type=int, default=200000, help="Filas a convertir (default: 200000)")
+    parser.add_argument("--columns", type=int, default=40, help="Columnas por fila (default: 40)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Filas por lote (default: 5000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso; se informa la mejor (default: 3)")
+    args = parser.parse_args()
+
+    columns, rows = build_table(args.columns, args.rows)
+    compiled = compile_converter(columns)
+    if compiled(rows[:100]) != [convert_data(row) for row in rows[:100]]:
+        sys.exit("El conversor compilado no coincide con convert_data")
+
+    cases = [
+        ("convert_data", lambda batch: [convert_data(row) for row in batch]),
+        ("compilado por fila", lambda batch: [compiled([row])[0] for row in batch]),
+        ("compilado por lote", compiled),
+    ]
+    header = f"{'conversión':<20} {'s':>8} {'filas/s':>12} {'aceleración':>12}"
+    print(f"{args.rows} filas de {args.columns} columnas, lotes de {args.batch_size}")
+    print(header)
+    print("-" * len(header))
+    baseline = None
+    for name, convert in cases:
+        elapsed = measure(convert, rows, args.batch_size, args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<20} {elapsed:>8.2f} {args.rows / elapsed:>12.0f} {baseline / elapsed:>11.1f}x")
+
+if __name__ == "__main__":
+    main()
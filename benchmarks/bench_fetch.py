@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark de lectura remota: compara el costo de traer filas del remoto (DBR_*) con cursores
+dict, de tuplas y raw, con y sin protocolo comprimido, y con la extensión C o la
+implementación pura de mysql-connector. Reporta tiempo, CPU del cliente y bytes enviados por
+el servidor, normalizados por millón de filas.
+
+    python benchmarks/bench_fetch.py --database mi_base --table mi_tabla --rows 1000000
+"""
+import os
+import sys
+import time
+import argparse
+from typing import Dict, Any
+import mysql.connector
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sync_mysql_remote import DatabaseConfig
+
+def session_bytes_sent(connection) -> int:
+    cursor = connection.cursor()
+    cursor.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    value = int(cursor.fetchone()[1])
+    cursor.close()
+    return value
+
+def run_case(config: DatabaseConfig, database: str, table: str, rows: int, chunk_size: int,
+             mode: str, compress: bool, use_pure: bool) -> Dict[str, Any]:
+    """Lee rows filas y las deja listas para insertar (listas de valores), como TableSync"""
+    connection = mysql.connector.connect(host=config.host, port=config.port, user=config.username,
+                                         password=config.password, database=database,
+                                         compress=compress, use_pure=use_pure)
+    try:
+        bytes_before = session_bytes_sent(connection)
+        cursor = connection.cursor(dictionary=(mode == "dict"), raw=(mode == "raw"))
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        cursor.execute(f"SELECT * FROM `{table}` LIMIT %s", (rows,))
+        columns = [description[0] for description in cursor.description]
+        fetched = 0
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            if mode == "dict":
+                # Conversión que hacía TableSync antes del cursor de tuplas
+                chunk = [[row[col] for col in columns] for row in chunk]
+            fetched += len(chunk)
+        wall, cpu = time.perf_counter() - wall_started, time.process_time() - cpu_started
+        cursor.close()
+        sent = session_bytes_sent(connection) - bytes_before
+    finally:
+        connection.close()
+    return {'rows': fetched, 'wall': wall, 'cpu': cpu, 'bytes': sent}
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Compara modos de lectura remota (cursor y protocolo).")
+    parser.add_argument("--database", required=True, help="Base de datos remota")
+    parser.add_argument("--table", required=True, help="Tabla a leer")
+    parser.add_argument("--rows", type=int, default=1000000, help="Filas leídas por caso (default: 1000000)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Filas por fetchmany (default: 5000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso; se informa la mejor (default: 3)")
+    args = parser.parse_args()
+
+    config = DatabaseConfig("DBR")
+    implementations = [False, True] if mysql.connector.HAVE_CEXT else [True]
+    cases = [(mode, compress, use_pure)
+             for use_pure in implementations
+             for compress in (False, True)
+             for mode in ("dict", "tuple", "raw")]
+
+    header = (f"{'implementación':<15} {'modo':<6} {'comprimido':<11} {'filas':>10} {'s':>8} "
+              f"{'CPU s/1M':>9} {'MB/1M':>8} {'filas/s':>10}")
+    print(header)
+    print("-" * len(header))
+    for mode, compress, use_pure in cases:
+        best = min((run_case(config, args.database, args.table, args.rows, args.chunk_size, mode, compress, use_pure)
+                    for _ in range(max(1, args.repeat))), key=lambda result: result['wall'])
+        per_million = 1000000 / best['rows'] if best['rows'] else 0
+        print(f"{'pura' if use_pure else 'extensión C':<15} {mode:<6} {'sí' if compress else 'no':<11} "
+              f"{best['rows']:>10} {best['wall']:>8.2f} {best['cpu'] * per_million:>9.2f} "
+              f"{best['bytes'] * per_million / 1024 / 1024:>8.1f} {best['rows'] / best['wall'] if best['wall'] else 0:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Benchmark reproducible de sincronización con esquemas sintéticos: cadena de claves foráneas,
+filas anchas, BLOBs y una tabla referenciada por datetime (con empates). Carga los datos en
+un MySQL/MariaDB local (DB_*) y mide, para cada tamaño:
+
+  - table_sync: carga completa con TableSync de bench_sync_src a bench_sync_dst y latencia
+    de una sincronización incremental de una fila
+  - changelog: aplicación de cambios UPDATE/DELETE con ChangelogSynchronizer desde un
+    mongod local que hace de changelog, y latencia de un cambio individual
+  - mongo: migración completa con sync_mysql_mongo.sync_database y latencia de una pasada
+    incremental
+
+Cada escenario corre en un proceso propio para medir su pico de memoria (RSS). Las bases
+bench_sync_* (MySQL y MongoDB) se eliminan y recrean en cada tamaño. Las variables de
+entorno del motor (SYNC_INSERT_MODE, SYNC_SNAPSHOT, SYNC_PIPELINE_QUEUE_SIZE, ...) se
+respetan, por lo que cada optimización se compara corriendo el benchmark con y sin ella.
+
+    python benchmarks/bench_sync.py --sizes 10000,1000000 --output resultados.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import resource
+import contextlib
+import multiprocessing
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Dict, Any, Callable
+import mysql.connector
+from pymongo import MongoClient
+from bson import ObjectId
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import sync_mysql_mongo
+from sync_mysql_remote import (
+    DatabaseConfig, MySQLConnection, SyncState, TableAnalyzer, TableSync, ChangelogSynchronizer,
+    build_dependency_levels, percentile
+)
+
+SOURCE_DB = "bench_sync_src"
+TARGET_DB = "bench_sync_dst"
+LATENCY_SAMPLES = 20
+
+SCHEMA = {
+    "fk_parent": """
+        CREATE TABLE fk_parent (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(64) NOT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB""",
+    "fk_child": """
+        CREATE TABLE fk_child (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            parent_id INT NOT NULL,
+            amount DECIMAL(12,2) NOT NULL,
+            note VARCHAR(255) NULL,
+            FOREIGN KEY (parent_id) REFERENCES fk_parent (id)
+        ) ENGINE=InnoDB""",
+    "fk_grandchild": """
+        CREATE TABLE fk_grandchild (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            child_id INT NOT NULL,
+            flag TINYINT NOT NULL,
+            payload VARCHAR(100) NOT NULL,
+            FOREIGN KEY (child_id) REFERENCES fk_child (id)
+        ) ENGINE=InnoDB""",
+    "wide_rows": """
+        CREATE TABLE wide_rows (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            """ + ",\n            ".join(
+                f"c{index:02d} {'VARCHAR(32)' if index % 2 else 'INT'} NULL" for index in range(1, 31)) + """,
+            total DECIMAL(14,4) NULL,
+            updated DATETIME NULL
+        ) ENGINE=InnoDB""",
+    "blobs": """
+        CREATE TABLE blobs (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            data BLOB NOT NULL
+        ) ENGINE=InnoDB""",
+    "events_dt": """
+        CREATE TABLE events_dt (
+            device_id INT NOT NULL,
+            seq INT NOT NULL,
+            created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            value DOUBLE NOT NULL,
+            PRIMARY KEY (device_id, seq),
+            KEY idx_created_at (created_at)
+        ) ENGINE=InnoDB"""
+}
+
+def table_rows(table: str, size: int) -> int:
+    """Filas de cada tabla para un tamaño: los BLOBs se reducen para acotar el volumen"""
+    return max(1, size // 10) if table == "blobs" else size
+
+def generate_rows(table: str, start: int, count: int, size: int) -> List[tuple]:
+    """Genera filas deterministas (semilla por bloque) para una tabla"""
+    rng = random.Random(f"{table}:{start}")
+    base = datetime(2024, 1, 1)
+    if table == "fk_parent":
+        return [(f"parent-{n}", base + timedelta(seconds=n)) for n in range(start, start + count)]
+    if table == "fk_child":
+        return [(rng.randint(1, size), Decimal(rng.randint(0, 10 ** 7)) / 100, f"nota {n}")
+                for n in range(start, start + count)]
+    if table == "fk_grandchild":
+        return [(rng.randint(1, size), n % 2, f"payload-{n:012d}") for n in range(start, start + count)]
+    if table == "wide_rows":
+        return [tuple(f"v{n}-{index}" if index % 2 else n * index for index in range(1, 31))
+                + (Decimal(n) / 7, base + timedelta(minutes=n)) for n in range(start, start + count)]
+    if table == "blobs":
+        return [(rng.randbytes(1024),) for _ in range(count)]
+    # events_dt: 100 eventos por segundo, para ejercitar los empates del campo datetime
+    return [(n % 1000, n, base + timedelta(seconds=n // 100), rng.random()) for n in range(start, start + count)]
+
+INSERT_COLUMNS = {
+    "fk_parent": ["name", "created_at"],
+    "fk_child": ["parent_id", "amount", "note"],
+    "fk_grandchild": ["child_id", "flag", "payload"],
+    "wide_rows": [f"c{index:02d}" for index in range(1, 31)] + ["total", "updated"],
+    "blobs": ["data"],
+    "events_dt": ["device_id", "seq", "created_at", "value"]
+}
+
+def mysql_settings() -> Dict[str, Any]:
+    config = DatabaseConfig("DB")
+    return {"host": config.host, "port": config.port, "user": config.username, "password": config.password}
+
+def recreate_database(database: str):
+    connection = mysql.connector.connect(**mysql_settings())
+    cursor = connection.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}`")
+    cursor.execute(f"USE `{database}`")
+    for ddl in SCHEMA.values():
+        cursor.execute(ddl)
+    cursor.close()
+    connection.close()
+
+def load_source(size: int, batch: int = 2000):
+    """Crea la base origen y la llena con size filas por tabla"""
+    recreate_database(SOURCE_DB)
+    connection = mysql.connector.connect(database=SOURCE_DB, **mysql_settings())
+    cursor = connection.cursor()
+    for table in SCHEMA:
+        columns = INSERT_COLUMNS[table]
+        query = (f"INSERT INTO `{table}` ({', '.join(f'`{col}`' for col in columns)}) "
+                 f"VALUES ({', '.join(['%s'] * len(columns))})")
+        total = table_rows(table, size)
+        for start in range(1, total + 1, batch):
+            cursor.executemany(query, generate_rows(table, start, min(batch, total - start + 1), size))
+            connection.commit()
+    cursor.close()
+    connection.close()
+
+def copy_source_to_target():
+    """Deja la base destino igual a la origen (punto de partida del escenario changelog)"""
+    recreate_database(TARGET_DB)
+    connection = mysql.connector.connect(database=TARGET_DB, **mysql_settings())
+    cursor = connection.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in SCHEMA:
+        cursor.execute(f"INSERT INTO `{TARGET_DB}`.`{table}` SELECT * FROM `{SOURCE_DB}`.`{table}`")
+        connection.commit()
+    cursor.close()
+    connection.close()
+
+def insert_parent(connection) -> None:
+    cursor = connection.cursor()
+    cursor.execute("INSERT INTO fk_parent (name) VALUES ('latencia')")
+    connection.commit()
+    cursor.close()
+
+def check_rows(table: str, copied: int, size: int):
+    """Una copia incompleta (o vacía) invalida la medición: se informa como error del escenario"""
+    expected = table_rows(table, size)
+    if copied != expected:
+        raise RuntimeError(f"{table}: se copiaron {copied} filas de {expected}")
+
+def scenario_table_sync(size: int, mongo_uri: str) -> Dict[str, Any]:
+    recreate_database(TARGET_DB)
+    config = DatabaseConfig("DB")
+    with MySQLConnection(config, SOURCE_DB) as remote_conn, MySQLConnection(config, TARGET_DB) as local_conn:
+        SyncState(local_conn).ensure_table()
+        tables_info = TableAnalyzer(local_conn, cache_dir="").analyze_tables()
+        rows = 0
+        started = time.perf_counter()
+        for level in build_dependency_levels(tables_info):
+            for table_info in level:
+                table_sync = TableSync(remote_conn, local_conn, table_info, None)
+                table_sync.sync_table()
+                rows += table_sync.stats['rows_inserted']
+                check_rows(table_info['name'], table_sync.stats['rows_inserted'], size)
+        seconds = time.perf_counter() - started
+
+        # Latencia: una fila nueva en el origen hasta quedar confirmada en el destino
+        parent_info = next(info for info in tables_info if info['name'] == "fk_parent")
+        latencies = []
+        for _ in range(LATENCY_SAMPLES):
+            insert_parent(remote_conn.connection)
+            sample_started = time.perf_counter()
+            TableSync(remote_conn, local_conn, parent_info, None).sync_table()
+            latencies.append(time.perf_counter() - sample_started)
+    return {'rows': rows, 'seconds': seconds, 'latencies': latencies}
+
+def scenario_changelog(size: int, mongo_uri: str) -> Dict[str, Any]:
+    copy_source_to_target()
+    client = MongoClient(mongo_uri)
+    changelog = client.teccam_mongo.changelog
+    changelog.delete_many({"base_datos": TARGET_DB})
+
+    # Actualiza montos de fk_child y borra el 10% de fk_grandchild (tabla hoja)
+    rng = random.Random("changelog")
+    changes, batch = 0, []
+    for record_id in range(1, size + 1):
+        batch.append({"base_datos": TARGET_DB, "tabla": "fk_child", "operacion": "UPDATE", "id_registro": record_id,
+                      "estado_actual": {"amount": rng.randint(0, 10 ** 6) / 100, "note": f"cambio {record_id}"}})
+        if record_id % 10 == 0:
+            batch.append({"base_datos": TARGET_DB, "tabla": "fk_grandchild", "operacion": "DELETE",
+                          "id_registro": record_id})
+        if len(batch) >= 10000:
+            changes += len(batch)
+            changelog.insert_many(batch)
+            batch = []
+    if batch:
+        changes += len(batch)
+        changelog.insert_many(batch)
+
+    config = DatabaseConfig("DB")
+    try:
+        with MySQLConnection(config, TARGET_DB) as local_conn:
+            state = SyncState(local_conn)
+            state.ensure_table()
+            # Se arranca justo antes del primer cambio generado
+            first = changelog.find_one({"base_datos": TARGET_DB}, sort=[("_id", 1)])
+            state.set(ChangelogSynchronizer.STATE_KEY, ObjectId.from_datetime(first["_id"].generation_time - timedelta(seconds=1)))
+            local_conn.connection.commit()
+            key_catalog = TableAnalyzer(local_conn, cache_dir="").get_key_catalog()
+
+            synchronizer = ChangelogSynchronizer(TARGET_DB, client, key_catalog=key_catalog)
+            started = time.perf_counter()
+            synchronizer.consume(local_conn)
+            seconds = time.perf_counter() - started
+
+            latencies = []
+            for sample in range(LATENCY_SAMPLES):
+                changelog.insert_one({"base_datos": TARGET_DB, "tabla": "fk_child", "operacion": "UPDATE",
+                                      "id_registro": sample + 1, "estado_actual": {"note": f"latencia {sample}"}})
+                sample_started = time.perf_counter()
+                synchronizer.consume(local_conn)
+                latencies.append(time.perf_counter() - sample_started)
+    finally:
+        changelog.delete_many({"base_datos": TARGET_DB})
+        client.close()
+    return {'rows': changes, 'seconds': seconds, 'latencies': latencies}
+
+def scenario_mongo(size: int, mongo_uri: str) -> Dict[str, Any]:
+    client = MongoClient(mongo_uri)
+    client.drop_database(SOURCE_DB)
+    client.sync_status.sync_status.delete_many({"database": SOURCE_DB})
+    settings = mysql_settings()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            sync_mysql_mongo.sync_database(settings, client, SOURCE_DB)
+            seconds = time.perf_counter() - started
+            rows = 0
+            for table in SCHEMA:
+                copied = client[SOURCE_DB][table].count_documents({})
+                check_rows(table, copied, size)
+                rows += copied
+
+            # Cada pasada incremental recorre todas las tablas de la base
+            latencies = []
+            connection = mysql.connector.connect(database=SOURCE_DB, **settings)
+            for _ in range(max(1, LATENCY_SAMPLES // 4)):
+                insert_parent(connection)
+                sample_started = time.perf_counter()
+                sync_mysql_mongo.sync_database(settings, client, SOURCE_DB)
+                latencies.append(time.perf_counter() - sample_started)
+            connection.close()
+    finally:
+        client.drop_database(SOURCE_DB)
+        client.sync_status.sync_status.delete_many({"database": SOURCE_DB})
+        client.close()
+    return {'rows': rows, 'seconds': seconds, 'latencies': latencies}
+
+SCENARIOS: Dict[str, Callable[[int, str], Dict[str, Any]]] = {
+    "table_sync": scenario_table_sync,
+    "changelog": scenario_changelog,
+    "mongo": scenario_mongo
+}
+
+def _run_child(name: str, size: int, mongo_uri: str, results: multiprocessing.Queue):
+    load_dotenv()
+    logging.getLogger("sync_mysql_remote").setLevel(logging.WARNING)
+    try:
+        result = SCENARIOS[name](size, mongo_uri)
+        # ru_maxrss está en KB en Linux
+        result['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        results.put(result)
+    except Exception as e:
+        results.put({'error': str(e)})
+
+def run_isolated(name: str, size: int, mongo_uri: str) -> Dict[str, Any]:
+    """Corre un escenario en un proceso aparte, para que el pico de RSS sea solo suyo"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_child, args=(name, size, mongo_uri, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Benchmark de sincronización con esquemas sintéticos.")
+    parser.add_argument("--sizes", default="10000",
+                        help="Filas por tabla, separadas por comas (p. ej. 10000,1000000,10000000; default: 10000)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Escenarios a correr (default: {','.join(SCENARIOS)})")
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGO_URI", "mongodb://localhost:27017/"),
+                        help="mongod local usado como changelog y destino (default: BENCH_MONGO_URI o localhost)")
+    parser.add_argument("--output", default=None, help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    logging.getLogger("sync_mysql_remote").setLevel(logging.WARNING)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Escenarios desconocidos: {', '.join(unknown)}")
+
+    header = (f"{'escenario':<12} {'tamaño':>10} {'filas':>10} {'s':>9} {'filas/s':>10} "
+              f"{'RSS MB':>8} {'lat p50 ms':>11} {'lat p95 ms':>11}")
+    print(header)
+    print("-" * len(header))
+    report = []
+    for size in sizes:
+        load_started = time.perf_counter()
+        load_source(size)
+        print(f"(origen de {size} filas por tabla cargado en {time.perf_counter() - load_started:.1f}s)")
+        for name in scenarios:
+            result = run_isolated(name, size, args.mongo_uri)
+            result.update({'scenario': name, 'size': size})
+            report.append(result)
+            if 'error' in result:
+                print(f"{name:<12} {size:>10} error: {result['error']}")
+                continue
+            latencies = result['latencies'] or [0.0]
+            print(f"{name:<12} {size:>10} {result['rows']:>10} {result['seconds']:>9.2f} "
+                  f"{result['rows'] / result['seconds'] if result['seconds'] else 0:>10.0f} "
+                  f"{result['peak_rss_mb']:>8.1f} {percentile(latencies, 0.5) * 1000:>11.1f} "
+                  f"{percentile(latencies, 0.95) * 1000:>11.1f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump({'timestamp': datetime.now().isoformat(), 'results': report}, output, indent=2)
+
+if __name__ == "__main__":
+    main()
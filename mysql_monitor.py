@@ -39,6 +39,33 @@ def get_system_metrics(process_name="mysqld"):
             continue
     return total_cpu, total_memory
 
+def get_status_metrics(cursor):
+    """
+    Ejecuta SHOW GLOBAL STATUS con un cursor (no diccionario) ya abierto y devuelve
+    un diccionario con las métricas de MySQL seleccionadas.
+    """
+    cursor.execute("SHOW GLOBAL STATUS")
+    status = dict(cursor.fetchall())
+
+    # Métricas seleccionadas de MySQL
+    return {
+        "Connections": int(status.get("Connections", 0)),
+        "Threads_connected": int(status.get("Threads_connected", 0)),
+        "Threads_running": int(status.get("Threads_running", 0)),
+        "Uptime": int(status.get("Uptime", 0)),
+        "Uptime_since_flush_status": int(status.get("Uptime_since_flush_status", 0)),
+        "Questions": int(status.get("Questions", 0)),
+        "Slow_queries": int(status.get("Slow_queries", 0)),
+        "Innodb_buffer_pool_read_requests": int(status.get("Innodb_buffer_pool_read_requests", 0)),
+        "Innodb_buffer_pool_reads": int(status.get("Innodb_buffer_pool_reads", 0)),
+        "Innodb_buffer_pool_pages_free": int(status.get("Innodb_buffer_pool_pages_free", 0)),
+        "Innodb_buffer_pool_pages_total": int(status.get("Innodb_buffer_pool_pages_total", 0)),
+        "Innodb_rows_inserted": int(status.get("Innodb_rows_inserted", 0)),
+        "Innodb_rows_read": int(status.get("Innodb_rows_read", 0)),
+        "Innodb_rows_updated": int(status.get("Innodb_rows_updated", 0)),
+        "Innodb_rows_deleted": int(status.get("Innodb_rows_deleted", 0))
+    }
+
 def get_mysql_metrics(host="localhost", port=3306, user=None, password=None, database=None):
     """
     Conecta a MySQL y obtiene métricas mediante SHOW GLOBAL STATUS,
@@ -60,29 +87,9 @@ def get_mysql_metrics(host="localhost", port=3306, user=None, password=None, dat
         sys.exit(f"Error al conectar a MySQL: {err}")
     
     cursor = conn.cursor()
-    cursor.execute("SHOW GLOBAL STATUS")
-    status = dict(cursor.fetchall())
+    metrics = get_status_metrics(cursor)
     cursor.close()
     conn.close()
-
-    # Métricas seleccionadas de MySQL
-    metrics = {
-        "Connections": int(status.get("Connections", 0)),
-        "Threads_connected": int(status.get("Threads_connected", 0)),
-        "Threads_running": int(status.get("Threads_running", 0)),
-        "Uptime": int(status.get("Uptime", 0)),
-        "Uptime_since_flush_status": int(status.get("Uptime_since_flush_status", 0)),
-        "Questions": int(status.get("Questions", 0)),
-        "Slow_queries": int(status.get("Slow_queries", 0)),
-        "Innodb_buffer_pool_read_requests": int(status.get("Innodb_buffer_pool_read_requests", 0)),
-        "Innodb_buffer_pool_reads": int(status.get("Innodb_buffer_pool_reads", 0)),
-        "Innodb_buffer_pool_pages_free": int(status.get("Innodb_buffer_pool_pages_free", 0)),
-        "Innodb_buffer_pool_pages_total": int(status.get("Innodb_buffer_pool_pages_total", 0)),
-        "Innodb_rows_inserted": int(status.get("Innodb_rows_inserted", 0)),
-        "Innodb_rows_read": int(status.get("Innodb_rows_read", 0)),
-        "Innodb_rows_updated": int(status.get("Innodb_rows_updated", 0)),
-        "Innodb_rows_deleted": int(status.get("Innodb_rows_deleted", 0))
-    }
     
     # Agregar métricas del sistema para el proceso MySQL
     cpu_usage, memory_used = get_system_metrics("mysqld")
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+from typing import List, Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+from mysql.connector import Error
+
+# Dependencia opcional: solo este script lee el binlog (pip install mysql-replication)
+try:
+    from pymysqlreplication import BinLogStreamReader
+    from pymysqlreplication.gtid import Gtid, GtidSet
+    from pymysqlreplication.event import GtidEvent, XidEvent, QueryEvent, RotateEvent, HeartbeatLogEvent
+    from pymysqlreplication.row_event import WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent
+except ImportError:
+    BinLogStreamReader = None
+
+from sync_mysql_remote import (
+    logger, as_str, DatabaseConfig, MySQLConnection, SyncState, TableAnalyzer, RowInserter,
+    ChangelogSynchronizer, DatabaseSync, SYNC_STATE_TABLE
+)
+
+def normalize_value(value: Any) -> Any:
+    """Adapta los valores decodificados del binlog a los que acepta mysql-connector"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, set):
+        return ",".join(sorted(value))
+    return value
+
+class BinlogCDC:
+    """
+    Captura de cambios desde el binlog (formato ROW) del MySQL remoto de una base: en lugar
+    de consultar las tablas, recibe como réplica cada INSERT/UPDATE/DELETE y lo aplica en la
+    base local. Las inserciones usan RowInserter (ON DUPLICATE KEY UPDATE, idempotente) y las
+    actualizaciones y borrados la aplicación por lotes de ChangelogSynchronizer. La posición
+    (archivo+posición y conjunto GTID) se guarda en la tabla de estado local en la misma
+    transacción que los cambios, siempre al final de una transacción remota completa.
+    """
+    POSITION_KEY = "binlog:position"
+    GTID_KEY = "binlog:gtid"
+
+    def __init__(self, database: str, server_id: Optional[int] = None, position_mode: Optional[str] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.database = database
+        self.remote_config = DatabaseConfig("DBR")
+        self.local_config = DatabaseConfig("DB")
+        # Identificador de réplica: debe ser único entre las réplicas del remoto (uno por base)
+        self.server_id = server_id or int(os.getenv("SYNC_CDC_SERVER_ID", "4242"))
+        # Posición de reanudación: 'file' (archivo+posición) o 'gtid' (requiere gtid_mode=ON)
+        self.position_mode = position_mode or os.getenv("SYNC_CDC_POSITION", "file")
+        # Filas acumuladas y tiempo máximo entre confirmaciones locales
+        self.batch_size = batch_size or int(os.getenv("SYNC_CDC_BATCH_SIZE", "1000"))
+        self.flush_interval = flush_interval or float(os.getenv("SYNC_CDC_FLUSH_INTERVAL", "0.5"))
+        self.report_interval = float(os.getenv("SYNC_CDC_REPORT_INTERVAL", "60"))
+        self.running = True
+        self.local_conn = None
+        self.state = None
+        self.changelog = None
+        self.key_columns = {}
+        self.reference_fields = {}
+        self.levels = {}
+        self.watermarks = {}
+        self._warned_tables = set()
+        # Cambios de la transacción remota en curso y de las transacciones ya completas
+        self.pending = []
+        self.ready = []
+        self.dirty = False
+        self.log_file = None
+        self.log_pos = None
+        self.gtid_set = None
+        self.current_gtid = None
+        self.last_event_time = None
+        self.last_flush = time.monotonic()
+        self.last_report = time.monotonic()
+        self._sequence = 0
+        self.stats = {
+            'transactions': 0,
+            'row_events': 0,
+            'rows_processed': 0,
+            'rows_inserted': 0,
+            'batches': 0,
+            'flushes': 0,
+            'errors': 0
+        }
+
+    def stop(self, *args):
+        logger.info(f"Deteniendo el CDC de {self.database}")
+        self.running = False
+
+    def connection_settings(self) -> Dict[str, Any]:
+        return {
+            'host': self.remote_config.host,
+            'port': self.remote_config.port,
+            'user': self.remote_config.username,
+            'passwd': self.remote_config.password
+        }
+
+    def load_schema(self, refresh: bool = False):
+        """Carga claves, campos de referencia y niveles de dependencia desde el esquema local"""
+        analyzer = TableAnalyzer(self.local_conn)
+        if refresh:
+            analyzer.get_schema(refresh=True)
+        key_catalog = analyzer.get_key_catalog()
+        self.key_columns = {}
+        for table, keys in key_catalog.items():
+            key = keys['primary_key'] or (keys['unique_keys'][0] if keys['unique_keys'] else None)
+            if key:
+                self.key_columns[table] = tuple(key)
+        self.levels = {table: keys['level'] for table, keys in key_catalog.items()}
+        self.reference_fields = {info['name']: info['reference_field'] for info in analyzer.analyze_tables()}
+        self.changelog = ChangelogSynchronizer(self.database, key_catalog=key_catalog)
+
+    @staticmethod
+    def get_remote_position(remote_conn: MySQLConnection) -> Tuple[str, int, str]:
+        """Archivo, posición y conjunto GTID actuales del binlog remoto"""
+        row = None
+        # MySQL 8.4 reemplazó SHOW MASTER STATUS por SHOW BINARY LOG STATUS
+        for statement in ("SHOW BINARY LOG STATUS", "SHOW MASTER STATUS"):
+            try:
+                remote_conn.cursor.execute(statement)
+                row = remote_conn.cursor.fetchone()
+                break
+            except Error:
+                continue
+        if not row:
+            raise RuntimeError("El remoto no tiene el binlog habilitado")
+        return as_str(row['File']), int(row['Position']), as_str(row.get('Executed_Gtid_Set') or "").replace("\n", "")
+
+    def load_checkpoint(self) -> bool:
+        """Carga la última posición confirmada; False si el CDC nunca corrió en esta base"""
+        position = self.state.get(self.POSITION_KEY)
+        gtid = self.state.get(self.GTID_KEY)
+        if not position or not position['value']:
+            return False
+        self.log_file, log_pos = position['value'].rsplit(":", 1)
+        self.log_pos = int(log_pos)
+        self.gtid_set = GtidSet(gtid['value']) if gtid and gtid['value'] else GtidSet(None)
+        return True
+
+    def save_checkpoint(self):
+        """Registra la posición (sin confirmar: se confirma junto con los cambios)"""
+        self.state.set(self.POSITION_KEY, f"{self.log_file}:{self.log_pos}")
+        if self.gtid_set is not None:
+            self.state.set(self.GTID_KEY, str(self.gtid_set))
+
+    def stream_arguments(self) -> Dict[str, Any]:
+        arguments = {
+            'connection_settings': self.connection_settings(),
+            'server_id': self.server_id,
+            'blocking': True,
+            'resume_stream': True,
+            'only_schemas': [self.database],
+            'ignored_tables': [SYNC_STATE_TABLE],
+            'only_events': [GtidEvent, XidEvent, QueryEvent, RotateEvent, HeartbeatLogEvent,
+                            WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent],
+            # Sin eventos, el remoto envía latidos: permiten confirmar y atender señales
+            'slave_heartbeat': max(self.flush_interval, 0.1)
+        }
+        if self.position_mode == 'gtid' and self.gtid_set and self.gtid_set.gtids:
+            arguments['auto_position'] = str(self.gtid_set)
+        else:
+            arguments['log_file'] = self.log_file
+            arguments['log_pos'] = self.log_pos
+        return arguments
+
+    def handle_event(self, event: Any, stream: Any):
+        if isinstance(event, GtidEvent):
+            self.current_gtid = event.gtid
+        elif isinstance(event, (WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent)):
+            self.stats['row_events'] += 1
+            for row in event.rows:
+                if isinstance(event, WriteRowsEvent):
+                    self.pending.append(('INSERT', event.table, None, row['values']))
+                elif isinstance(event, UpdateRowsEvent):
+                    self.pending.append(('UPDATE', event.table, row['before_values'], row['after_values']))
+                else:
+                    self.pending.append(('DELETE', event.table, row['values'], None))
+        elif isinstance(event, XidEvent):
+            self._end_transaction(stream)
+        elif isinstance(event, QueryEvent):
+            query = as_str(event.query).strip().upper()
+            if query in ("COMMIT", "ROLLBACK"):
+                # Fin de una transacción con tablas no transaccionales: equivale a un Xid
+                self._end_transaction(stream)
+            elif query != "BEGIN":
+                # DDL: se confirma implícitamente y puede cambiar claves o columnas
+                self._end_transaction(stream)
+                if as_str(event.schema) == self.database:
+                    logger.warning(f"DDL en {self.database}: {as_str(event.query)[:200]}")
+                    self.flush()
+                    self.load_schema(refresh=True)
+        if not isinstance(event, HeartbeatLogEvent) and event.timestamp:
+            self.last_event_time = event.timestamp
+
+        elapsed = time.monotonic() - self.last_flush
+        if self.dirty and (len(self.ready) >= self.batch_size or elapsed >= self.flush_interval):
+            self.flush()
+
+    def _end_transaction(self, stream: Any):
+        """Una transacción remota terminó: sus cambios pasan a estar listos para aplicarse"""
+        self.ready.extend(self.pending)
+        self.pending = []
+        self.log_file, self.log_pos = stream.log_file, stream.log_pos
+        if self.current_gtid and self.gtid_set is not None:
+            self.gtid_set = self.gtid_set + Gtid(self.current_gtid)
+        self.current_gtid = None
+        self.stats['transactions'] += 1
+        self.dirty = True
+
+    def _row_key(self, table: str, image: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        key_columns = self.key_columns.get(table)
+        if not key_columns:
+            if table not in self._warned_tables:
+                logger.warning(f"Tabla {table} sin clave primaria/única: sus cambios no se aplican por CDC")
+                self._warned_tables.add(table)
+            return None
+        return tuple(image[col] for col in key_columns)
+
+    def coalesce(self) -> Tuple[Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+        """
+        Reduce los cambios listos al estado final de cada registro: las filas creadas en el
+        lote (o borradas y recreadas) se insertan con INSERT ... ON DUPLICATE KEY UPDATE, que
+        actualiza sin borrar las que ya estaban en local; las existentes se actualizan con
+        UPDATE y las borradas se eliminan.
+        """
+        final = {}
+        for operation, table, before, after in self.ready:
+            if operation == 'UPDATE' and self._row_key(table, before) != self._row_key(table, after):
+                # Cambio de clave: equivale a borrar la fila anterior y crear la nueva
+                self._record(final, 'DELETE', table, before)
+                self._record(final, 'INSERT', table, after)
+            else:
+                self._record(final, operation, table, after if operation != 'DELETE' else before)
+
+        inserts, changes = {}, []
+        for (table, key), entry in final.items():
+            image = {col: normalize_value(value) for col, value in entry['image'].items()}
+            if entry['operation'] != 'DELETE' and entry['first'] in ('INSERT', 'DELETE'):
+                inserts.setdefault(table, []).append(image)
+                continue
+            self._sequence += 1
+            change = {"_id": self._sequence, "operacion": entry['operation'], "tabla": table,
+                      "id_registro": key[0] if len(key) == 1 else key}
+            change["estado_anterior" if entry['operation'] == 'DELETE' else "estado_actual"] = image
+            changes.append(change)
+        return inserts, changes
+
+    def _record(self, final: Dict[Tuple[str, Any], Dict[str, Any]], operation: str, table: str,
+                image: Dict[str, Any]):
+        key = self._row_key(table, image)
+        if key is None:
+            return
+        entry = final.setdefault((table, key), {'first': operation})
+        entry['operation'] = operation
+        entry['image'] = image
+
+    def flush(self):
+        """Aplica los cambios listos y confirma la posición en la misma transacción local"""
+        if not self.dirty:
+            return
+        inserts, changes = self.coalesce()
+        try:
+            # Primero las tablas padre, para que las hijas nuevas encuentren su referencia
+            for table in sorted(inserts, key=lambda name: self.levels.get(name, 0)):
+                rows = inserts[table]
+                columns = list(rows[0].keys())
+                inserter = RowInserter(self.local_conn, f"`{table}`", self.stats, upsert=True)
+                inserter.insert([f"`{col}`" for col in columns], [[row[col] for col in columns] for row in rows])
+                self._advance_watermark(table, rows)
+            if changes:
+                self.changelog.apply_changes_to_local(changes, self.local_conn)
+            self.save_checkpoint()
+            self.local_conn.connection.commit()
+        except Error:
+            self.local_conn.connection.rollback()
+            raise
+
+        self.stats['flushes'] += 1
+        self.ready = []
+        self.dirty = False
+        self.last_flush = time.monotonic()
+
+    def _advance_watermark(self, table: str, rows: List[Dict[str, Any]]):
+        """Mantiene al día la marca de agua de TableSync para que el sondeo no repita estas filas"""
+        reference_field = self.reference_fields.get(table)
+        if not reference_field:
+            return
+        values = [row[reference_field] for row in rows if row.get(reference_field) is not None]
+        if not values:
+            return
+        state_key = f"table:{table}"
+        if state_key not in self.watermarks:
+            entry = self.state.get(state_key)
+            self.watermarks[state_key] = entry['value'] if entry else None
+        current = self.watermarks[state_key]
+        try:
+            highest = max(values)
+            if current is None or highest > current:
+                self.state.set(state_key, highest, reference_field)
+                self.watermarks[state_key] = highest
+        except TypeError:
+            pass
+
+    def report(self):
+        lag = time.time() - self.last_event_time if self.last_event_time else 0.0
+        logger.info(f"CDC {self.database}: {self.stats['transactions']} transacciones, "
+                    f"{self.stats['rows_inserted']} filas insertadas/actualizadas, "
+                    f"{self.changelog.stats['updates_applied']} actualizadas, "
+                    f"{self.changelog.stats['deletes_applied']} borradas, "
+                    f"{self.stats['errors'] + self.changelog.stats['errors']} errores; "
+                    f"posición {self.log_file}:{self.log_pos}, retraso {max(lag, 0.0):.1f}s")
+        self.last_report = time.monotonic()
+
+    def run(self, catch_up: bool = False):
+        """Lee el binlog hasta recibir SIGINT/SIGTERM"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        allow_local_infile = os.getenv("SYNC_INSERT_MODE", "batch") == "load_data"
+        with MySQLConnection(self.local_config, self.database, allow_local_infile) as local_conn:
+            self.local_conn = local_conn
+            self.state = SyncState(local_conn)
+            self.state.ensure_table()
+            self.state.ensure_capacity()
+            self.load_schema()
+
+            if not self.load_checkpoint():
+                # Primera ejecución: se arranca desde la posición actual del remoto
+                with MySQLConnection(self.remote_config) as remote_conn:
+                    self.log_file, self.log_pos, gtid_executed = self.get_remote_position(remote_conn)
+                self.gtid_set = GtidSet(gtid_executed or None)
+                self.save_checkpoint()
+                local_conn.connection.commit()
+                logger.info(f"CDC {self.database}: sin posición previa, se inicia en {self.log_file}:{self.log_pos}")
+                if catch_up:
+                    # Filas anteriores a la posición: las copia el sondeo. El binlog reaplica
+                    # desde esa posición las filas que el sondeo ya copió: las inserciones van
+                    # con ON DUPLICATE KEY UPDATE y no borran la fila local ni sus hijas
+                    DatabaseSync(self.database).sync_database()
+
+            stream = BinLogStreamReader(**self.stream_arguments())
+            logger.info(f"CDC {self.database}: leyendo binlog desde {self.log_file}:{self.log_pos}"
+                        + (f" (GTID {self.gtid_set})" if self.position_mode == 'gtid' else ""))
+            try:
+                while self.running:
+                    event = stream.fetchone()
+                    if event is None:
+                        break
+                    self.handle_event(event, stream)
+                    if time.monotonic() - self.last_report >= self.report_interval:
+                        self.report()
+                self.flush()
+            finally:
+                stream.close()
+                self.report()
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Replica en la base local los cambios del binlog (formato ROW) del MySQL remoto."
+    )
+    parser.add_argument("--database", default=None,
+                        help="Base de datos a replicar (default: la única de MYSQL_DATABASES)")
+    parser.add_argument("--server-id", type=int, default=None,
+                        help="server_id de réplica, único por proceso (default: SYNC_CDC_SERVER_ID o 4242)")
+    parser.add_argument("--position", choices=["file", "gtid"], default=None,
+                        help="Reanudar por archivo+posición o por GTID (default: SYNC_CDC_POSITION o file)")
+    parser.add_argument("--catch-up", action="store_true",
+                        help="En la primera ejecución, sincroniza por sondeo las filas anteriores a la posición inicial")
+    args = parser.parse_args()
+
+    if BinLogStreamReader is None:
+        sys.exit("Falta la dependencia opcional mysql-replication (pip install mysql-replication).")
+
+    database = args.database
+    if not database:
+        databases = [db.strip() for db in os.getenv("MYSQL_DATABASES", "").split(",") if db.strip()]
+        if len(databases) != 1:
+            sys.exit("Indique --database: se ejecuta un proceso de CDC por base de datos.")
+        database = databases[0]
+
+    try:
+        BinlogCDC(database, args.server_id, args.position).run(args.catch_up)
+    except (Error, RuntimeError) as e:
+        logger.error(f"Error en el CDC de {database}: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
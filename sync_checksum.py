@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+import os
+import sys
+import argparse
+from typing import List, Dict, Any, Optional, Tuple
+from dotenv import load_dotenv
+from mysql.connector import Error
+
+from sync_mysql_remote import (
+    logger, DatabaseConfig, MySQLConnection, TableAnalyzer, RowInserter, SYNC_STATE_TABLE
+)
+
+def row_checksum_expression(columns: List[str]) -> str:
+    """
+    Expresión SQL con el CRC32 de una fila. CONCAT_WS omite los NULL, por lo que se agregan
+    marcas ISNULL() para distinguir (NULL, 'a') de ('a', NULL).
+    """
+    quoted = [f"`{col}`" for col in columns]
+    null_flags = "CONCAT(" + ", ".join(f"ISNULL({col})" for col in quoted) + ")"
+    return f"CRC32(CONCAT_WS('#', {', '.join(quoted)}, {null_flags}))"
+
+class TableChecksum:
+    """
+    Compara una tabla entre remoto y local por rangos de clave primaria (al estilo de
+    pt-table-checksum): cada rango se resume con COUNT(*) y BIT_XOR(CRC32(...)) en ambos
+    lados, y solo los rangos que difieren se vuelven a copiar desde el remoto.
+    """
+    def __init__(self, remote_conn: MySQLConnection, local_conn: MySQLConnection, table: str,
+                 table_schema: Dict[str, Any], reference_field: Optional[str] = None,
+                 chunk_size: Optional[int] = None):
+        self.remote_conn = remote_conn
+        self.local_conn = local_conn
+        self.table = table
+        self.columns = [col['Field'] for col in table_schema['columns']]
+        self.key = table_schema['primary_key'][0]
+        self.reference_field = reference_field
+        self.chunk_size = chunk_size or int(os.getenv("CHECKSUM_CHUNK_SIZE", "10000"))
+        self.row_checksum = row_checksum_expression(self.columns)
+        # Máximo local del campo de referencia: las filas posteriores aún no se sincronizaron
+        self.upper_bound = None
+        self.stats = {
+            'chunks_checked': 0,
+            'chunks_different': 0,
+            'rows_processed': 0,
+            'rows_inserted': 0,
+            'rows_deleted': 0,
+            'errors': 0
+        }
+
+    @staticmethod
+    def supports(table_schema: Dict[str, Any]) -> bool:
+        """Se verifican las tablas con clave primaria de una sola columna"""
+        return len(table_schema['primary_key']) == 1
+
+    def _range_condition(self, low: Any, high: Any) -> Tuple[str, List[Any]]:
+        """
+        Condición WHERE del rango [low, high) más el límite de filas ya sincronizadas; las filas
+        con referencia NULL no tienen límite (se copian aparte en la primera carga) y se incluyen
+        """
+        condition, params = f"`{self.key}` >= %s", [low]
+        if high is not None:
+            condition += f" AND `{self.key}` < %s"
+            params.append(high)
+        if self.reference_field and self.upper_bound is not None:
+            condition += f" AND (`{self.reference_field}` <= %s OR `{self.reference_field}` IS NULL)"
+            params.append(self.upper_bound)
+        return condition, params
+
+    def get_chunks(self) -> List[Tuple[Any, Any]]:
+        """Divide la tabla en rangos de clave de chunk_size filas, según las claves del remoto"""
+        lows = []
+        for conn in (self.remote_conn, self.local_conn):
+            conn.cursor.execute(f"SELECT MIN(`{self.key}`) AS min_key FROM `{self.table}`")
+            row = conn.cursor.fetchone()
+            if row and row['min_key'] is not None:
+                lows.append(row['min_key'])
+        if not lows:
+            return []
+
+        chunks = []
+        low = min(lows)
+        while True:
+            self.remote_conn.cursor.execute(
+                f"SELECT `{self.key}` AS boundary FROM `{self.table}` WHERE `{self.key}` > %s "
+                f"ORDER BY `{self.key}` LIMIT 1 OFFSET %s", (low, self.chunk_size - 1))
+            row = self.remote_conn.cursor.fetchone()
+            if not row:
+                # Último rango abierto: incluye filas locales por encima del máximo remoto
+                chunks.append((low, None))
+                return chunks
+            chunks.append((low, row['boundary']))
+            low = row['boundary']
+
+    def chunk_checksum(self, conn: MySQLConnection, low: Any, high: Any) -> Tuple[int, int]:
+        """Cantidad de filas y checksum combinado de un rango"""
+        condition, params = self._range_condition(low, high)
+        conn.cursor.execute(
+            f"SELECT COUNT(*) AS row_count, COALESCE(BIT_XOR({self.row_checksum}), 0) AS checksum "
+            f"FROM `{self.table}` WHERE {condition}", params)
+        row = conn.cursor.fetchone()
+        return int(row['row_count']), int(row['checksum'])
+
+    def chunk_differs(self, low: Any, high: Any) -> bool:
+        return self.chunk_checksum(self.remote_conn, low, high) != self.chunk_checksum(self.local_conn, low, high)
+
+    def find_differences(self) -> List[Tuple[Any, Any]]:
+        """Devuelve los rangos cuyo contenido difiere entre remoto y local"""
+        if self.reference_field:
+            self.local_conn.cursor.execute(
+                f"SELECT MAX(`{self.reference_field}`) AS max_value FROM `{self.table}`")
+            row = self.local_conn.cursor.fetchone()
+            self.upper_bound = row['max_value'] if row else None
+            if self.upper_bound is None:
+                # Tabla local vacía: todavía no hay nada sincronizado que comparar
+                return []
+
+        different = []
+        for low, high in self.get_chunks():
+            self.stats['chunks_checked'] += 1
+            if self.chunk_differs(low, high):
+                different.append((low, high))
+        self.stats['chunks_different'] = len(different)
+        return different
+
+    def repair_chunk(self, low: Any, high: Any):
+        """Reemplaza las filas locales de un rango por las del remoto, en una sola transacción"""
+        # Se vuelve a comparar para descartar diferencias transitorias (escrituras en curso)
+        if not self.chunk_differs(low, high):
+            return
+
+        condition, params = self._range_condition(low, high)
+        column_list = ", ".join(f"`{col}`" for col in self.columns)
+        self.remote_conn.cursor.execute(
+            f"SELECT {column_list} FROM `{self.table}` WHERE {condition} ORDER BY `{self.key}`", params)
+        rows = [[row[col] for col in self.columns] for row in self.remote_conn.cursor.fetchall()]
+
+        # Contadores propios: solo se suman a self.stats si el rango se confirma
+        stats = {'rows_processed': 0, 'rows_inserted': 0, 'batches': 0, 'errors': 0}
+        inserter = RowInserter(self.local_conn, f"`{self.table}`", stats, insert_mode='batch')
+        self.local_conn.connection.start_transaction()
+        try:
+            self.local_conn.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            self.local_conn.cursor.execute(f"DELETE FROM `{self.table}` WHERE {condition}", params)
+            deleted = self.local_conn.cursor.rowcount
+            inserter.insert([f"`{col}`" for col in self.columns], rows)
+            # RowInserter registra y descarta las filas que fallan: si alguna no se pudo volver
+            # a insertar, confirmar dejaría filas borradas sin reponer
+            if stats['errors']:
+                raise Error(msg=f"{stats['errors']} filas del rango no se pudieron reinsertar")
+            self.local_conn.connection.commit()
+            self.stats['rows_deleted'] += deleted
+            self.stats['rows_inserted'] += stats['rows_inserted']
+        except Error:
+            self.local_conn.connection.rollback()
+            raise
+        finally:
+            self.local_conn.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+def verify_database(database: str, repair: bool = False, tables: Optional[List[str]] = None,
+                    chunk_size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Verifica (y opcionalmente repara) las tablas de una base; devuelve el resultado por tabla"""
+    results = []
+    with MySQLConnection(DatabaseConfig("DBR"), database) as remote_conn, \
+         MySQLConnection(DatabaseConfig("DB"), database) as local_conn:
+        # Cada consulta ve los datos actuales en lugar de una instantánea fija
+        remote_conn.connection.autocommit = True
+        local_conn.connection.autocommit = True
+
+        analyzer = TableAnalyzer(local_conn)
+        schema = analyzer.get_schema()
+        reference_fields = {info['name']: info['reference_field'] for info in analyzer.analyze_tables()}
+
+        for table in sorted(schema):
+            if table == SYNC_STATE_TABLE or (tables and table not in tables):
+                continue
+            if not TableChecksum.supports(schema[table]):
+                logger.warning(f"Tabla {database}.{table} sin clave primaria de una columna: no se verifica")
+                continue
+
+            checker = TableChecksum(remote_conn, local_conn, table, schema[table],
+                                    reference_fields.get(table), chunk_size)
+            try:
+                different = checker.find_differences()
+                if repair:
+                    for low, high in different:
+                        checker.repair_chunk(low, high)
+            except Error as e:
+                logger.error(f"Error verificando {database}.{table}: {e}")
+                checker.stats['errors'] += 1
+
+            logger.info(f"Verificación {database}.{table}: {checker.stats['chunks_checked']} rangos, "
+                        f"{checker.stats['chunks_different']} con diferencias"
+                        + (f", {checker.stats['rows_inserted']} filas reparadas" if repair else ""))
+            results.append({'database': database, 'table': table, **checker.stats})
+    return results
+
+def main():
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Detecta (y repara) diferencias entre las bases MySQL remotas y locales por rangos de clave."
+    )
+    parser.add_argument("--database", action="append", default=None,
+                        help="Base de datos a verificar (repetible; default: MYSQL_DATABASES)")
+    parser.add_argument("--table", action="append", default=None, help="Tabla a verificar (repetible)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Filas por rango comparado (default: CHECKSUM_CHUNK_SIZE o 10000)")
+    parser.add_argument("--repair", action="store_true", help="Vuelve a copiar desde el remoto los rangos que difieren")
+    args = parser.parse_args()
+
+    databases = args.database or [db.strip() for db in os.getenv("MYSQL_DATABASES", "").split(",") if db.strip()]
+    if not databases:
+        sys.exit("No se especificaron bases de datos (--database o MYSQL_DATABASES).")
+
+    different = 0
+    for database in databases:
+        try:
+            results = verify_database(database, args.repair, args.table, args.chunk_size)
+            different += sum(result['chunks_different'] for result in results)
+        except Error as e:
+            logger.error(f"Error verificando base de datos {database}: {e}")
+            sys.exit(1)
+
+    # Código de salida 2 si quedaron diferencias sin reparar (útil desde cron)
+    if different and not args.repair:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,24 @@
 #!/usr/bin/env python3
 import os
+import re
+import hashlib
 from dotenv import load_dotenv
 import sys
+import time as clock
+import threading
 import mysql.connector
-from pymongo import MongoClient
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, as_completed
+from pymongo import MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
 from decimal import Decimal
 from datetime import datetime, date, time, timezone, timedelta
 
 # Cargar variables de entorno desde .env
 load_dotenv()
 
+# Tabla de estado que sync_mysql_remote.py crea en cada base local: no se replica
+SYNC_STATE_TABLE = "_sync_state"
+
 def convert_data(data):
     """
     Recorre recursivamente el objeto 'data' y convierte:
@@ -30,70 +39,397 @@ def convert_data(data):
     else:
         return data
 
-def sync_database(mysql_config, mongo_client, database_name):
+def _decimal_to_float(value):
+    return float(value)
+
+def _date_to_datetime(value):
+    # Los DATETIME también son date: solo se convierten los DATE puros
+    return datetime.combine(value, time.min, tzinfo=timezone.utc) if type(value) is date else value
+
+def _timedelta_to_seconds(value):
+    return value.total_seconds()
+
+def compile_converter(columns):
     """
-    Sincroniza la base de datos MySQL a MongoDB:
-      - Crea en MongoDB una base con el mismo nombre que la base MySQL.
-      - Dentro de esa base, cada tabla (excluyendo vistas) se replica en una colección.
-      - Se realiza una sincronización incremental basada en una columna de referencia:
-          * Primero se busca una columna de tipo INT con auto_increment.
-          * Si no se encuentra, se busca una columna de tipo datetime/timestamp con default CURRENT_TIMESTAMP.
-      - Se actualiza el estado de sincronización en la base "sync_status", colección "sync_status",
-        guardando "database", "table", "last_value" y "reference".
+    Compila, a partir de los tipos de DESCRIBE, la conversión a BSON de una tabla: solo las
+    columnas DECIMAL, DATE y TIME necesitan convertirse (a float, datetime UTC y segundos, igual
+    que convert_data). Devuelve una función que recibe un lote de filas y devuelve los
+    documentos, convirtiendo columna por columna sobre todo el lote.
+    """
+    conversions = []
+    for col in columns:
+        col_type = col.get("Type", "")
+        if isinstance(col_type, bytes):
+            col_type = col_type.decode("utf-8")
+        col_type = col_type.lower()
+        if col_type.startswith(("decimal", "numeric")):
+            conversions.append((col["Field"], _decimal_to_float))
+        elif col_type == "date":
+            conversions.append((col["Field"], _date_to_datetime))
+        elif col_type.startswith("time") and not col_type.startswith("timestamp"):
+            conversions.append((col["Field"], _timedelta_to_seconds))
+
+    def convert(rows):
+        documents = [dict(row) for row in rows]
+        for field, function in conversions:
+            for document in documents:
+                value = document[field]
+                if value is not None:
+                    document[field] = function(value)
+        return documents
+    return convert
+
+def primary_key_columns(columns):
+    """Columnas de la clave primaria según DESCRIBE (en el orden de la tabla)"""
+    return [col["Field"] for col in columns if col.get("Key") == "PRI"]
+
+def document_id(document, key_columns):
+    """_id del documento: el valor de la clave primaria o, si es compuesta, un subdocumento"""
+    if len(key_columns) == 1:
+        return document[key_columns[0]]
+    return {col: document[col] for col in key_columns}
+
+def row_hash(document):
+    """Huella del contenido de una fila, para detectar cambios sin comparar campo a campo"""
+    return hashlib.md5(repr(list(document.values())).encode("utf-8")).hexdigest()
+
+def write_documents(collection, documents, key_columns=None):
+    """
+    Escribe un lote de documentos ya convertidos. Sin key_columns (modo insert) usa insert_many(ordered=False); con
+    key_columns (modo upsert) usa _id = clave primaria y ReplaceOne(upsert=True) sin orden, por
+    lo que repetir un lote no duplica documentos. Lanza BulkWriteError si falla alguna escritura.
+    """
+    if not key_columns:
+        collection.insert_many(documents, ordered=False)
+        return
+    operations = []
+    for document in documents:
+        document["_id"] = document_id(document, key_columns)
+        operations.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+    collection.bulk_write(operations, ordered=False)
+
+def find_snapshot_key(columns):
+    """Devuelve la clave primaria si es una sola columna entera (permite dividir la tabla en rangos)"""
+    primary = [col for col in columns if col.get("Key") == "PRI"]
+    if len(primary) != 1:
+        return None
+    col_type = primary[0].get("Type", "")
+    if isinstance(col_type, bytes):
+        col_type = col_type.decode("utf-8")
+    return primary[0]["Field"] if re.match(r"(tiny|small|medium|big)?int\b", col_type.lower()) else None
+
+def copy_snapshot_slice(mysql_config, mongo_client, database_name, table, key_column, reference_column,
+                        index, low, high, start, bound, chunk_size, convert):
+    """
+    Copia las filas con clave en (low, high] y referencia <= bound dentro de una transacción
+    WITH CONSISTENT SNAPSHOT, guardando el avance de la porción después de cada bloque.
     """
+    sync_status_collection = mongo_client["sync_status"]["sync_status"]
+    collection = mongo_client[database_name][table]
+    key_columns = [key_column] if os.getenv("MONGO_SYNC_MODE", "insert") == "upsert" else None
+    mysql_conn = mysql.connector.connect(database=database_name, **mysql_config)
+    copied = 0
     try:
+        mysql_conn.start_transaction(consistent_snapshot=True, readonly=True)
+        cursor = mysql_conn.cursor(dictionary=True)
+        last_key = start if start is not None else low
+        while True:
+            cursor.execute(
+                f"SELECT * FROM `{table}` WHERE `{key_column}` > %s AND `{key_column}` <= %s "
+                f"AND `{reference_column}` <= %s ORDER BY `{key_column}` LIMIT %s",
+                (last_key, high, bound, chunk_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            write_documents(collection, convert(rows), key_columns)
+            copied += len(rows)
+            last_key = rows[-1][key_column]
+            # Si el proceso se corta entre la inserción y este registro, el bloque se repite al reanudar
+            sync_status_collection.update_one(
+                {"database": database_name, "table": table},
+                {"$set": {f"snapshot.progress.{index}": last_key}})
+            if len(rows) < chunk_size:
+                break
+        cursor.close()
+        mysql_conn.rollback()
+        sync_status_collection.update_one(
+            {"database": database_name, "table": table},
+            {"$set": {f"snapshot.progress.{index}": high}})
+    finally:
+        mysql_conn.close()
+    return copied
+
+def snapshot_table(mysql_config, mongo_client, database_name, table, key_column, reference_column, status_doc,
+                   convert):
+    """
+    Carga inicial en paralelo de una tabla con clave primaria entera: divide el rango MIN/MAX
+    de la clave en porciones que se copian en hilos con conexiones propias. El avance queda en
+    sync_status, por lo que una carga interrumpida se reanuda. Solo copia filas con referencia
+    hasta el máximo al inicio; al terminar, la sincronización incremental continúa desde ahí.
+    Devuelve los registros copiados, o None si la tabla no tiene filas para copiar.
+    """
+    sync_status_collection = mongo_client["sync_status"]["sync_status"]
+    workers = int(os.getenv("MONGO_SYNC_SNAPSHOT_WORKERS", "4"))
+    chunk_size = int(os.getenv("MONGO_SYNC_SNAPSHOT_CHUNK_SIZE", "5000"))
+    snapshot = (status_doc or {}).get("snapshot")
+
+    if not snapshot:
         mysql_conn = mysql.connector.connect(database=database_name, **mysql_config)
-    except mysql.connector.Error as err:
-        sys.exit(f"Error al conectar a la base de datos {database_name}: {err}")
+        try:
+            cursor = mysql_conn.cursor(dictionary=True)
+            cursor.execute(f"SELECT MIN(`{key_column}`) AS min_key, MAX(`{key_column}`) AS max_key, "
+                           f"MAX(`{reference_column}`) AS max_value FROM `{table}`")
+            row = cursor.fetchone()
+            cursor.close()
+        finally:
+            mysql_conn.close()
+        if not row or row["min_key"] is None or row["max_value"] is None:
+            return None
+        low, high = int(row["min_key"]), int(row["max_key"])
+        snapshot = {
+            "bound": row["max_value"],
+            "low": low,
+            "high": high,
+            "slices": max(1, min(int(os.getenv("MONGO_SYNC_SNAPSHOT_SLICES", "16")), high - low + 1)),
+            "progress": {}
+        }
+        sync_status_collection.update_one(
+            {"database": database_name, "table": table},
+            {"$set": {"snapshot": snapshot, "reference": reference_column}},
+            upsert=True)
+
+    low, high, slices = snapshot["low"], snapshot["high"], snapshot["slices"]
+    boundaries = [low - 1 + ((high - low + 1) * index) // slices for index in range(slices + 1)]
+    progress = {int(index): value for index, value in snapshot.get("progress", {}).items()}
+    pending = [index for index in range(slices) if progress.get(index, boundaries[index]) < boundaries[index + 1]]
+    print(f"Carga inicial de {database_name}.{table}: {len(pending)} de {slices} porciones pendientes")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending) or 1))) as executor:
+        futures = [executor.submit(copy_snapshot_slice, mysql_config, mongo_client, database_name, table,
+                                   key_column, reference_column, index, boundaries[index],
+                                   boundaries[index + 1], progress.get(index), snapshot["bound"], chunk_size, convert)
+                   for index in pending]
+        wait(futures)
+        copied = sum(future.result() for future in futures)
+
+    bound = snapshot["bound"]
+    last_value = bound.timestamp() if isinstance(bound, datetime) else int(bound)
+    sync_status_collection.update_one(
+        {"database": database_name, "table": table},
+        {"$set": {"last_value": last_value, "reference": reference_column}, "$unset": {"snapshot": ""}},
+        upsert=True)
+    print(f"Carga inicial de {database_name}.{table} completa: {copied} registros")
+    return copied
+
+def stream_table(cursor, mongo_client, database_name, table, reference_column, reference_is_int,
+                 last_synced_value, batch_size, convert, key_columns=None):
+    """
+    Copia las filas nuevas de una tabla en lotes de batch_size leídos de un cursor sin buffer
+    (el servidor entrega las filas a medida que se consumen), por lo que la memoria no depende
+    del tamaño de la tabla. Con campo de referencia las filas se leen ordenadas y last_value se
+    guarda después de cada lote: como varias filas pueden compartir el valor (datetime), solo se
+    confirma el mayor valor anterior al de la última fila del lote, cuyas filas ya están todas
+    en MongoDB. Tras una caída se repite a lo sumo un lote (sin duplicados en modo upsert, con
+    key_columns). Devuelve los registros escritos.
+    """
+    sync_status_collection = mongo_client["sync_status"]["sync_status"]
+    collection = mongo_client[database_name][table]
+
+    if reference_column:
+        condition, params = "", ()
+        if last_synced_value is not None:
+            # Los campos datetime/timestamp se guardan como segundos desde epoch
+            placeholder = "%s" if reference_is_int else "FROM_UNIXTIME(%s)"
+            condition, params = f" WHERE `{reference_column}` > {placeholder}", (last_synced_value,)
+        cursor.execute(f"SELECT * FROM `{table}`{condition} ORDER BY `{reference_column}`", params)
+    else:
+        cursor.execute(f"SELECT * FROM `{table}`")
+
+    def save_checkpoint(value):
+        last_value = int(value) if reference_is_int else value.timestamp()
+        sync_status_collection.update_one(
+            {"database": database_name, "table": table},
+            {"$set": {"last_value": last_value, "reference": reference_column}},
+            upsert=True
+        )
+
+    inserted = 0
+    saved, pending = None, None
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        try:
+            write_documents(collection, convert(rows), key_columns)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0) + e.details.get("nUpserted", 0) + e.details.get("nModified", 0)
+            print(f"Error al insertar registros en {database_name}.{table}: {e.details.get('writeErrors', [])[:1]}")
+            # El punto de control queda antes de este lote, que se repite en la próxima ejecución
+            return inserted
+        inserted += len(rows)
+
+        if reference_column:
+            values = [row[reference_column] for row in rows if row[reference_column] is not None]
+            if values:
+                pending = values[-1]
+                # Los auto_increment no se repiten: el lote completo ya es un punto de control seguro
+                complete = values if reference_is_int else [value for value in values if value < pending]
+                if complete and (saved is None or complete[-1] > saved):
+                    saved = complete[-1]
+                    save_checkpoint(saved)
+
+    # Fin de la lectura: las filas con el último valor también quedaron copiadas
+    if pending is not None and pending != saved:
+        save_checkpoint(pending)
+    return inserted
+
+def reconcile_table(cursor, mongo_client, database_name, table, key_columns, batch_size, convert):
+    """
+    Concilia una tabla sin campo de referencia (modo upsert): compara cada fila con el _id y la
+    huella (_row_hash) guardados en MongoDB, reescribe solo las filas nuevas o modificadas y
+    elimina los documentos cuyo _id ya no existe en MySQL, en lugar de recargar la tabla entera.
+    """
+    collection = mongo_client[database_name][table]
+    # _id guardados (los compuestos se indexan como tuplas) -> (_id, huella)
+    existing = {}
+    for document in collection.find({}, {"_row_hash": 1}):
+        key = tuple(document["_id"].items()) if isinstance(document["_id"], dict) else document["_id"]
+        existing[key] = (document["_id"], document.get("_row_hash"))
+
+    stats = {"written": 0, "unchanged": 0, "deleted": 0}
+    cursor.execute(f"SELECT * FROM `{table}`")
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        operations = []
+        for document in convert(rows):
+            document["_row_hash"] = row_hash(document)
+            document["_id"] = document_id(document, key_columns)
+            key = tuple(document["_id"].items()) if isinstance(document["_id"], dict) else document["_id"]
+            previous = existing.pop(key, None)
+            if previous and previous[1] == document["_row_hash"]:
+                stats["unchanged"] += 1
+                continue
+            operations.append(ReplaceOne({"_id": document["_id"]}, document, upsert=True))
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+            stats["written"] += len(operations)
+
+    # Los documentos que no aparecieron en la lectura fueron borrados en MySQL
+    removed = [stored_id for stored_id, _ in existing.values()]
+    for start in range(0, len(removed), batch_size):
+        stats["deleted"] += collection.delete_many({"_id": {"$in": removed[start:start + batch_size]}}).deleted_count
+    return stats
+
+def find_reference_column(columns):
+    """
+    Busca el campo de referencia de la sincronización incremental:
+      * Primero una columna de tipo INT con auto_increment.
+      * Si no se encuentra, una columna de tipo datetime/timestamp con default CURRENT_TIMESTAMP.
+    Devuelve (columna, es_entera) o (None, False).
+    """
+    # Buscar columna de tipo INT con auto_increment
+    for col in columns:
+        extra = col.get("Extra", "").lower()
+        col_type = col.get("Type", "")
+        if isinstance(col_type, bytes):
+            col_type = col_type.decode("utf-8")
+        col_type = col_type.lower()
+        if "auto_increment" in extra and "int" in col_type:
+            return col["Field"], True
     
+    # Si no se encontró, buscar columna de tipo datetime/timestamp con default CURRENT_TIMESTAMP
+    for col in columns:
+        col_type = col.get("Type", "")
+        if isinstance(col_type, bytes):
+            col_type = col_type.decode("utf-8")
+        col_type = col_type.lower()
+        default_val = col.get("Default", "")
+        if isinstance(default_val, bytes):
+            default_val = default_val.decode("utf-8")
+        if ("datetime" in col_type or "timestamp" in col_type) and default_val and "current_timestamp" in default_val.lower():
+            return col["Field"], False
+    return None, False
+
+def mongo_index_specs(statistics, reference_column, upsert):
+    """
+    Traduce los índices de INFORMATION_SCHEMA.STATISTICS a índices ascendentes de MongoDB:
+    devuelve (nombre, campos, único). Los índices FULLTEXT/SPATIAL y los funcionales se omiten.
+    Solo en modo upsert (un documento por fila) se crean índices únicos, y solo si todas sus
+    columnas son NOT NULL: MySQL admite varios NULL en un índice único y MongoDB no. Se agrega
+    un índice sobre el campo de referencia si ninguno empieza por él.
+    """
+    indexes = {}
+    for row in statistics:
+        row = {key: value.decode("utf-8") if isinstance(value, bytes) else value for key, value in row.items()}
+        index = indexes.setdefault(row["INDEX_NAME"], {"fields": [], "unique": not int(row["NON_UNIQUE"]),
+                                                       "nullable": False, "skip": False})
+        if row["COLUMN_NAME"] is None or row["INDEX_TYPE"] in ("FULLTEXT", "SPATIAL"):
+            index["skip"] = True
+            continue
+        index["fields"].append(row["COLUMN_NAME"])
+        index["nullable"] = index["nullable"] or row["NULLABLE"] == "YES"
+
+    specs, seen = [], set()
+    for name, index in indexes.items():
+        fields = tuple(index["fields"])
+        if index["skip"] or not fields or fields in seen:
+            continue
+        seen.add(fields)
+        unique = upsert and index["unique"] and not index["nullable"]
+        specs.append((f"mysql_{name}", [(field, 1) for field in fields], unique))
+
+    if reference_column and not any(keys[0][0] == reference_column for _, keys, _ in specs):
+        specs.append((f"ref_{reference_column}", [(reference_column, 1)], False))
+    return specs
+
+def ensure_indexes(cursor, collection, database_name, table, reference_column, upsert):
+    """
+    Crea en la colección los índices equivalentes a los de la tabla MySQL (create_index no hace
+    nada si el índice ya existe). Si un índice único no se puede crear, por ejemplo por
+    documentos duplicados de cargas anteriores, se crea sin unicidad.
+    """
+    cursor.execute("""
+        SELECT INDEX_NAME, NON_UNIQUE, SEQ_IN_INDEX, COLUMN_NAME, NULLABLE, INDEX_TYPE
+        FROM INFORMATION_SCHEMA.STATISTICS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (database_name, table))
+    for name, keys, unique in mongo_index_specs(cursor.fetchall(), reference_column, upsert):
+        try:
+            collection.create_index(keys, name=name, unique=unique)
+        except OperationFailure as e:
+            if not unique:
+                print(f"Advertencia al crear el índice {name} en {database_name}.{table}: {e}")
+                continue
+            print(f"No se pudo crear el índice único {name} en {database_name}.{table}; se crea sin unicidad")
+            try:
+                collection.create_index(keys, name=name)
+            except OperationFailure as e:
+                print(f"Advertencia al crear el índice {name} en {database_name}.{table}: {e}")
+
+def sync_table(mysql_conn, mysql_config, mongo_client, database_name, table):
+    """
+    Sincroniza una tabla MySQL en la colección del mismo nombre, usando la conexión recibida.
+    Devuelve el resultado de la tabla: registros escritos, duración y estado ("ok" o "error").
+    """
+    started = clock.perf_counter()
+    result = {"database": database_name, "table": table, "rows": 0, "seconds": 0.0, "status": "ok"}
+    sync_status_collection = mongo_client["sync_status"]["sync_status"]
+    batch_size = int(os.getenv("MONGO_SYNC_BATCH_SIZE", "5000"))
+    upsert = os.getenv("MONGO_SYNC_MODE", "insert") == "upsert"
+
     cursor = mysql_conn.cursor(dictionary=True)
-    
-    # Obtener las tablas de la base de datos (excluyendo vistas)
-    query_tables = """
-        SELECT TABLE_NAME
-        FROM INFORMATION_SCHEMA.TABLES
-        WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'
-    """
-    cursor.execute(query_tables, (database_name,))
-    tables = [row['TABLE_NAME'] for row in cursor.fetchall()]
-    
-    # Conectar a la colección de estado de sincronización
-    sync_db = mongo_client["sync_status"]
-    sync_status_collection = sync_db["sync_status"]
-    
-    for table in tables:
+    # Cursor sin buffer para la copia: las filas se traen del servidor de a lotes
+    stream_cursor = mysql_conn.cursor(dictionary=True, buffered=False)
+    try:
         print(f"Sincronizando tabla: {database_name}.{table}")
         
         # Analizar la estructura de la tabla para identificar el campo de referencia
         cursor.execute(f"DESCRIBE `{table}`")
         columns = cursor.fetchall()
-        
-        reference_column = None
-        
-        # Buscar columna de tipo INT con auto_increment
-        for col in columns:
-            extra = col.get("Extra", "").lower()
-            col_type = col.get("Type", "")
-            if isinstance(col_type, bytes):
-                col_type = col_type.decode("utf-8")
-            col_type = col_type.lower()
-            if "auto_increment" in extra and "int" in col_type:
-                reference_column = col["Field"]
-                break
-        
-        # Si no se encontró, buscar columna de tipo datetime/timestamp con default CURRENT_TIMESTAMP
-        if not reference_column:
-            for col in columns:
-                col_type = col.get("Type", "")
-                if isinstance(col_type, bytes):
-                    col_type = col_type.decode("utf-8")
-                col_type = col_type.lower()
-                default_val = col.get("Default", "")
-                if isinstance(default_val, bytes):
-                    default_val = default_val.decode("utf-8")
-                if ("datetime" in col_type or "timestamp" in col_type) and default_val and "current_timestamp" in default_val.lower():
-                    reference_column = col["Field"]
-                    break
+        reference_column, reference_is_int = find_reference_column(columns)
         
         if reference_column:
             print(f"Usando el campo de referencia '{reference_column}' para la tabla {table}")
@@ -103,61 +439,167 @@ def sync_database(mysql_config, mongo_client, database_name):
         # Consultar el estado previo de sincronización para esta tabla
         status_doc = sync_status_collection.find_one({"database": database_name, "table": table})
         last_synced_value = status_doc.get("last_value") if status_doc else None
+
+        # Conversión a BSON compilada una vez por tabla según los tipos de las columnas
+        convert = compile_converter(columns)
+
+        # Primera carga (o una interrumpida) de una tabla con clave entera: copia por rangos en paralelo
+        key_column = find_snapshot_key(columns)
+        copied = None
+        if (reference_column and key_column and last_synced_value is None
+                and os.getenv("MONGO_SYNC_SNAPSHOT", "1") == "1"):
+            copied = snapshot_table(mysql_config, mongo_client, database_name, table, key_column,
+                                    reference_column, status_doc, convert)
         
-        # Preparar consulta incremental si hay referencia y estado previo
-        if reference_column and last_synced_value is not None:
-            # Verificamos si es un campo int o datetime/timestamp
-            if "int" in col_type:
-                # Para campos int, la comparación es directa
-                query_data = f"SELECT * FROM `{table}` WHERE `{reference_column}` > %s"
-                cursor.execute(query_data, (last_synced_value,))
-            else:
-                # Asumimos que es datetime/timestamp, así que convertimos con FROM_UNIXTIME
-                query_data = f"SELECT * FROM `{table}` WHERE `{reference_column}` > FROM_UNIXTIME(%s)"
-                cursor.execute(query_data, (last_synced_value,))
-        else:
-            # Si no hay referencia o no se encontró last_synced_value, se hace carga completa
-            query_data = f"SELECT * FROM `{table}`"
-            cursor.execute(query_data)
-        
-        rows = cursor.fetchall()
-        if rows:
-            # Convertir registros para que sean compatibles con BSON
-            rows_converted = [convert_data(row) for row in rows]
-            
-            # Insertar registros en la colección de MongoDB correspondiente
-            mongo_db = mongo_client[database_name]
-            collection = mongo_db[table]
-            try:
-                collection.insert_many(rows_converted)
-                print(f"Insertados {len(rows)} registros en {database_name}.{table}")
-            except Exception as e:
-                print(f"Error al insertar registros en {database_name}.{table}: {e}")
-            
-            # Actualizar el estado de sincronización si se usa un campo de referencia
-            if reference_column:
-                try:
-                    if "int" in col_type:
-                        # Campo int
-                        max_val = max(int(r[reference_column]) for r in rows if r[reference_column] is not None)
-                    else:
-                        # Campo datetime/timestamp: obtener el valor máximo como float
-                        max_val = max(r[reference_column].timestamp()  
-                                    for r in rows
-                                    if r[reference_column] is not None and isinstance(r[reference_column], datetime))
-
-                    sync_status_collection.update_one(
-                        {"database": database_name, "table": table},
-                        {"$set": {"last_value": max_val, "reference": reference_column}},
-                        upsert=True
-                    )
-                except Exception as e:
-                    print(f"Advertencia al actualizar sync_status para {database_name}.{table}: {e}")
+        # Modo upsert: _id = clave primaria, escrituras idempotentes
+        key_columns = primary_key_columns(columns) if upsert else None
+        if upsert and not key_columns:
+            print(f"La tabla {database_name}.{table} no tiene clave primaria: se copia en modo insert")
+
+        if copied is not None:
+            result["rows"] = copied
+        elif key_columns and not reference_column:
+            stats = reconcile_table(stream_cursor, mongo_client, database_name, table, key_columns, batch_size,
+                                    convert)
+            print(f"Conciliada {database_name}.{table}: {stats['written']} escritos, "
+                  f"{stats['unchanged']} sin cambios, {stats['deleted']} eliminados")
+            result["rows"] = stats["written"] + stats["deleted"]
         else:
-            print(f"No se encontraron registros nuevos en {database_name}.{table}")
-    
-    cursor.close()
-    mysql_conn.close()
+            inserted = stream_table(stream_cursor, mongo_client, database_name, table, reference_column,
+                                    reference_is_int, last_synced_value, batch_size, convert, key_columns)
+            result["rows"] = inserted
+            if inserted:
+                print(f"Insertados {inserted} registros en {database_name}.{table}")
+            else:
+                print(f"No se encontraron registros nuevos en {database_name}.{table}")
+
+        # Índices después de la carga, para que la copia inicial no los mantenga fila por fila
+        if os.getenv("MONGO_SYNC_INDEXES", "1") == "1":
+            ensure_indexes(cursor, mongo_client[database_name][table], database_name, table,
+                           reference_column, bool(key_columns))
+        return result
+    except Exception as e:
+        print(f"Error al sincronizar {database_name}.{table}: {e}")
+        result["status"] = "error"
+        return result
+    finally:
+        stream_cursor.close()
+        cursor.close()
+        result["seconds"] = clock.perf_counter() - started
+
+def list_tables(mysql_config, database_name):
+    """Tablas de la base (sin vistas ni la tabla de estado) con su tamaño, de la más grande a la más chica"""
+    mysql_conn = mysql.connector.connect(database=database_name, **mysql_config)
+    try:
+        cursor = mysql_conn.cursor(dictionary=True)
+        cursor.execute("""
+            SELECT TABLE_NAME, COALESCE(DATA_LENGTH, 0) AS data_length
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE' AND TABLE_NAME <> %s
+            ORDER BY COALESCE(DATA_LENGTH, 0) DESC
+        """, (database_name, SYNC_STATE_TABLE))
+        tables = [(row['TABLE_NAME'], int(row['data_length'])) for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        mysql_conn.close()
+    return tables
+
+# Conexión MySQL de cada worker (hilo o proceso), reutilizada entre las tablas que procesa
+_worker = threading.local()
+_worker_connections = []
+_process_mongo_client = None
+
+def worker_connection(mysql_config, database_name):
+    connection = getattr(_worker, "connection", None)
+    if connection is None or not connection.is_connected():
+        # consume_results: si una copia se corta a mitad de la lectura, las filas sin leer se descartan
+        connection = mysql.connector.connect(consume_results=True, **mysql_config)
+        _worker.connection = connection
+        _worker_connections.append(connection)
+    connection.database = database_name
+    return connection
+
+def _thread_task(mysql_config, mongo_client, database_name, table):
+    return sync_table(worker_connection(mysql_config, database_name), mysql_config, mongo_client,
+                      database_name, table)
+
+def _init_process_worker():
+    # MongoClient no se puede compartir entre procesos: cada proceso crea el suyo
+    global _process_mongo_client
+    _process_mongo_client = MongoClient(mongo_uri_from_env())
+
+def _process_task(mysql_config, database_name, table):
+    return sync_table(worker_connection(mysql_config, database_name), mysql_config, _process_mongo_client,
+                      database_name, table)
+
+def migrate(mysql_config, mongo_client, databases, workers=None, worker_mode=None):
+    """
+    Migra todas las tablas de las bases indicadas con un pool de workers (MONGO_SYNC_WORKERS),
+    cada uno con su propia conexión MySQL. Las tablas de todas las bases comparten el pool y se
+    envían de la más grande a la más chica. Con MONGO_SYNC_WORKER_MODE=process los workers son
+    procesos (cada uno con su cliente MongoDB, creado desde MONGO_*), útil cuando la conversión
+    de filas limita a un solo núcleo. Devuelve el resultado de cada tabla.
+    """
+    workers = max(1, workers or int(os.getenv("MONGO_SYNC_WORKERS", "1")))
+    worker_mode = worker_mode or os.getenv("MONGO_SYNC_WORKER_MODE", "thread")
+
+    tasks, results = [], []
+    for database_name in databases:
+        try:
+            tasks.extend((size, database_name, table) for table, size in list_tables(mysql_config, database_name))
+        except mysql.connector.Error as err:
+            print(f"Error al conectar a la base de datos {database_name}: {err}")
+            results.append({"database": database_name, "table": None, "rows": 0, "seconds": 0.0, "status": "error"})
+    # Un solo orden para todas las bases: las tablas grandes arrancan primero y no quedan al final
+    tasks = [(database_name, table) for _, database_name, table in sorted(tasks, key=lambda task: -task[0])]
+
+    started = clock.perf_counter()
+    if worker_mode == "process" and workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker)
+        futures = [executor.submit(_process_task, mysql_config, database_name, table)
+                   for database_name, table in tasks]
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(_thread_task, mysql_config, mongo_client, database_name, table)
+                   for database_name, table in tasks]
+    try:
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            results.append(result)
+            print(f"[{done}/{len(futures)}] {result['database']}.{result['table']}: {result['rows']} registros "
+                  f"en {result['seconds']:.1f}s ({result['status']})")
+    finally:
+        executor.shutdown()
+        while _worker_connections:
+            _worker_connections.pop().close()
+
+    # Resumen por base
+    elapsed = clock.perf_counter() - started
+    for database_name in databases:
+        database_results = [result for result in results if result["database"] == database_name]
+        errors = sum(1 for result in database_results if result["status"] == "error")
+        rows = sum(result["rows"] for result in database_results)
+        busy = sum(result["seconds"] for result in database_results)
+        tables = sum(1 for result in database_results if result["table"] is not None)
+        print(f"Base {database_name}: {tables} tablas, {rows} registros, {errors} errores, "
+              f"{busy:.1f}s de trabajo")
+    print(f"Migración completa en {elapsed:.1f}s con {workers} workers ({worker_mode})")
+    return results
+
+def sync_database(mysql_config, mongo_client, database_name, workers=None):
+    """
+    Sincroniza la base de datos MySQL a MongoDB:
+      - Crea en MongoDB una base con el mismo nombre que la base MySQL.
+      - Dentro de esa base, cada tabla (excluyendo vistas) se replica en una colección.
+      - Se realiza una sincronización incremental basada en una columna de referencia
+        (ver find_reference_column).
+      - Se actualiza el estado de sincronización en la base "sync_status", colección "sync_status",
+        guardando "database", "table", "last_value" y "reference".
+    """
+    return migrate(mysql_config, mongo_client, [database_name], workers)
+
+def mongo_uri_from_env():
+    return f"mongodb://{os.getenv('MONGO_USERNAME')}:{os.getenv('MONGO_PASSWORD')}@{os.getenv('MONGO_HOST')}:27017/"
 
 def main():
     # Configuración MySQL extraída de variables de entorno
@@ -176,12 +618,12 @@ def main():
         sys.exit("No se especificaron bases de datos en la variable MYSQL_DATABASES.")
     
     # Configuración de MongoDB desde variables de entorno
-    mongo_uri = f"mongodb://{os.getenv('MONGO_USERNAME')}:{os.getenv('MONGO_PASSWORD')}@{os.getenv('MONGO_HOST')}:27017/"
-    mongo_client = MongoClient(mongo_uri)
+    mongo_client = MongoClient(mongo_uri_from_env())
     
-    # Sincronizar cada base de datos
-    for db in databases:
-        sync_database(mysql_config, mongo_client, db)
+    # Sincronizar todas las bases con un pool de workers compartido
+    results = migrate(mysql_config, mongo_client, databases)
+    if any(result["status"] == "error" for result in results):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,30 @@
 import os
 import sys
 import logging
+import re
+import math
+import time
+import heapq
+import queue
+import signal
+import itertools
+import argparse
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
+import tempfile
+from decimal import Decimal
+from datetime import datetime, date, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple, Iterator
 import pymongo
 from pymongo import MongoClient
+from bson import ObjectId
 import json
+from mysql_monitor import get_status_metrics
 
 # Configuración de logging
 logging.basicConfig(
@@ -21,18 +37,140 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Tabla local donde se persiste el estado de la sincronización (marcas de agua, cursores)
+SYNC_STATE_TABLE = "_sync_state"
+
+def estimate_row_bytes(values: List[Any]) -> int:
+    """Estima el tamaño en bytes de una fila para dimensionar los lotes de inserción"""
+    size = 0
+    for value in values:
+        if value is None:
+            size += 4
+        elif isinstance(value, (bytes, bytearray)):
+            size += len(value) * 2  # se envían escapados
+        else:
+            size += len(str(value)) + 2
+    return size + 3
+
+@contextmanager
+def timed(timings: Dict[str, float], phase: str):
+    """Acumula en timings[phase] los segundos que tarda el bloque"""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.monotonic() - started
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por rango más cercano (fraction entre 0 y 1) de una lista no vacía"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def to_infile_field(value: Any) -> bytes:
+    """Convierte un valor al formato de campo de LOAD DATA (tabulado, escapado con barra invertida)"""
+    if value is None:
+        return b"\\N"
+    if isinstance(value, (bytes, bytearray)):
+        raw = bytes(value)
+    elif isinstance(value, bool):
+        raw = b"1" if value else b"0"
+    elif isinstance(value, timedelta):
+        total = int(value.total_seconds())
+        sign = "-" if total < 0 else ""
+        hours, rest = divmod(abs(total), 3600)
+        raw = f"{sign}{hours:02d}:{rest // 60:02d}:{rest % 60:02d}".encode("utf-8")
+    elif isinstance(value, set):
+        raw = ",".join(sorted(value)).encode("utf-8")
+    else:
+        raw = str(value).encode("utf-8")
+    return (raw.replace(b"\\", b"\\\\").replace(b"\t", b"\\t").replace(b"\n", b"\\n")
+               .replace(b"\r", b"\\r").replace(b"\x00", b"\\0"))
+
+def build_dependency_levels(tables_info: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Agrupa las tablas en niveles topológicos según sus claves foráneas:
+    cada tabla queda en un nivel posterior a todas las tablas que referencia,
+    por lo que las tablas de un mismo nivel pueden sincronizarse en paralelo.
+    """
+    names = {info['name'] for info in tables_info}
+    pending = {
+        info['name']: {ref for ref in info.get('depends_on', []) if ref in names and ref != info['name']}
+        for info in tables_info
+    }
+    by_name = {info['name']: info for info in tables_info}
+    levels = []
+    while pending:
+        ready = [name for name, deps in pending.items() if not deps]
+        if not ready:
+            # Dependencias circulares: se sincronizan juntas al final en el orden original
+            logger.warning(f"Dependencias circulares entre tablas: {', '.join(sorted(pending))}")
+            ready = list(pending)
+        levels.append([by_name[name] for name in ready])
+        for name in ready:
+            del pending[name]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return levels
+
 class DatabaseConfig:
     def __init__(self, prefix: str):
         self.host = os.getenv(f"{prefix}_HOST")
         self.port = int(os.getenv(f"{prefix}_PORT", "3306"))
         self.username = os.getenv(f"{prefix}_USERNAME")
         self.password = os.getenv(f"{prefix}_PASSWORD")
+        # Protocolo comprimido: menos bytes en enlaces lentos (WAN) a cambio de CPU
+        self.compress = os.getenv(f"{prefix}_COMPRESS", "0") == "1"
         self.validate()
 
     def validate(self):
         if not all([self.host, self.username, self.password]):
             raise ValueError(f"Faltan parámetros de conexión para {self.__class__.__name__}")
 
+    @property
+    def host_key(self) -> str:
+        return f"{self.host}:{self.port}"
+
+class HostConnectionLimiter:
+    """Limita las conexiones simultáneas por host entre todas las bases que se sincronizan a la vez"""
+    def __init__(self, max_per_host: int):
+        self.max_per_host = max(2, max_per_host)
+        self._in_use = defaultdict(int)
+        self._condition = threading.Condition()
+
+    def acquire(self, hosts: List[str], wanted: int) -> int:
+        """
+        Reserva de forma atómica la misma cantidad de conexiones (entre 1 y wanted) en cada
+        host de la lista, esperando hasta que haya cupo. Un host puede repetirse si aloja
+        varios pools. Devuelve la cantidad reservada por cada aparición del host.
+        """
+        uses = Counter(hosts)
+        with self._condition:
+            while any(self.max_per_host - self._in_use[host] < count for host, count in uses.items()):
+                self._condition.wait()
+            granted = min([wanted] + [(self.max_per_host - self._in_use[host]) // count
+                                      for host, count in uses.items()])
+            for host, count in uses.items():
+                self._in_use[host] += granted * count
+            return granted
+
+    def try_acquire(self, hosts: List[str], wanted: int) -> int:
+        """Como acquire(), pero sin esperar: reserva las conexiones libres (entre 0 y wanted)"""
+        uses = Counter(hosts)
+        with self._condition:
+            granted = max(0, min([wanted] + [(self.max_per_host - self._in_use[host]) // count
+                                             for host, count in uses.items()]))
+            for host, count in uses.items():
+                self._in_use[host] += granted * count
+            return granted
+
+    def release(self, hosts: List[str], granted: int):
+        """Libera conexiones reservadas con acquire()"""
+        with self._condition:
+            for host, count in Counter(hosts).items():
+                self._in_use[host] -= granted * count
+            self._condition.notify_all()
+
 class MongoLogger:
     def __init__(self):
         self.client = MongoClient(
@@ -42,38 +180,250 @@ class MongoLogger:
         )
         self.db = self.client.sync_logs
         self.collection = self.db.sync_history
+        # Consultas de tiempos por tabla (--timings-report) y de la última sincronización
+        self.collection.create_index([("database", 1), ("table", 1), ("timestamp", -1)])
+        # Por defecto no se registran las tablas consultadas sin filas nuevas
+        self.log_empty_tables = os.getenv("SYNC_TIMINGS_LOG_EMPTY", "0") == "1"
 
     def log_sync_result(self, database: str, stats: Dict[str, Any]):
         log_entry = {
             "timestamp": datetime.now(),
+            "type": "database",
             "database": database,
             "stats": stats,
             "status": "success" if stats["errors"] == 0 else "partial"
         }
         self.collection.insert_one(log_entry)
 
+    def log_throttle_decision(self, decision: Dict[str, Any]):
+        """Registra una decisión del regulador de carga del remoto"""
+        self.collection.insert_one({
+            "timestamp": datetime.now(),
+            "type": "throttle",
+            **decision
+        })
+
+    def log_table_result(self, database: str, table: str, stats: Dict[str, Any]):
+        """Registra el resultado de una tabla con el tiempo de cada fase de su sincronización"""
+        if not (stats['rows_processed'] or stats['errors'] or self.log_empty_tables):
+            return
+        self.collection.insert_one({
+            "timestamp": datetime.now(),
+            "type": "table",
+            "database": database,
+            "table": table,
+            "stats": stats,
+            "status": "success" if stats["errors"] == 0 else "partial"
+        })
+
+    def get_table_timings(self, since: datetime, database: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Devuelve los registros por tabla desde una fecha, para resumir sus tiempos"""
+        query = {"type": "table", "timestamp": {"$gte": since}}
+        if database:
+            query["database"] = database
+        return list(self.collection.find(
+            query,
+            {"_id": 0, "database": 1, "table": 1, "stats": 1}
+        ))
+
     def get_last_sync(self, database: str) -> Optional[datetime]:
         last_entry = self.collection.find_one(
-            {"database": database},
+            {"database": database, "type": {"$nin": ["table", "throttle"]}},
             sort=[("timestamp", -1)]
         )
         return last_entry["timestamp"] if last_entry else None
 
+class RemoteThrottle:
+    """
+    Regulador adaptativo de la carga sobre el servidor remoto. Muestrea Threads_running
+    (con la misma lógica de SHOW GLOBAL STATUS de mysql_monitor) y el retraso de replicación,
+    y mantiene un factor entre SYNC_THROTTLE_MIN_FACTOR y 1 que reduce el tamaño de bloque y
+    la concurrencia cuando el remoto está ocupado, pausa la lectura cuando está saturado y los
+    recupera gradualmente cuando está ocioso. Cada cambio de decisión se registra en sync_history.
+    """
+    def __init__(self, config: DatabaseConfig, mongo_logger: Optional[MongoLogger] = None):
+        self.config = config
+        self.mongo_logger = mongo_logger
+        self.max_threads_running = int(os.getenv("SYNC_THROTTLE_MAX_THREADS_RUNNING", "20"))
+        self.max_lag = float(os.getenv("SYNC_THROTTLE_MAX_LAG", "30"))
+        self.sample_interval = float(os.getenv("SYNC_THROTTLE_SAMPLE_INTERVAL", "5"))
+        self.min_factor = float(os.getenv("SYNC_THROTTLE_MIN_FACTOR", "0.1"))
+        self.factor = 1.0
+        self.decision = "normal"
+        self._connection = None
+        self._check_lag = True
+        self._last_sample = 0.0
+        self._lock = threading.Lock()
+        # Lugares ocupados por cada base: cada una limita su concurrencia contra su propio pool
+        self._active = {}
+        self._slots = threading.Condition()
+
+    def _sample(self) -> Tuple[int, Optional[float]]:
+        """Obtiene Threads_running y el retraso de replicación (None si el remoto no es réplica)"""
+        if self._connection is None:
+            self._connection = MySQLConnection(self.config)
+            self._connection.connect()
+            self._connection.connection.autocommit = True
+        cursor = self._connection.connection.cursor()
+        try:
+            threads_running = get_status_metrics(cursor)["Threads_running"]
+        finally:
+            cursor.close()
+
+        lag = None
+        if self._check_lag:
+            try:
+                self._connection.cursor.execute("SHOW REPLICA STATUS")
+                status = self._connection.cursor.fetchone()
+            except Error:
+                try:
+                    self._connection.cursor.execute("SHOW SLAVE STATUS")
+                    status = self._connection.cursor.fetchone()
+                except Error:
+                    # Sin privilegios o sin soporte: se deja de consultar el retraso
+                    self._check_lag, status = False, None
+            if status:
+                lag = status.get("Seconds_Behind_Source", status.get("Seconds_Behind_Master"))
+        return threads_running, (float(lag) if lag is not None else None)
+
+    def update(self):
+        """Vuelve a muestrear el remoto si pasó el intervalo de muestreo y ajusta el factor"""
+        with self._lock:
+            if time.monotonic() - self._last_sample < self.sample_interval:
+                return
+            self._last_sample = time.monotonic()
+            try:
+                threads_running, lag = self._sample()
+            except Error as e:
+                logger.warning(f"No se pudo muestrear la carga de {self.config.host}: {e}")
+                if self._connection:
+                    self._connection.close()
+                    self._connection = None
+                return
+
+            load = threads_running / self.max_threads_running
+            if lag is not None:
+                load = max(load, lag / self.max_lag)
+
+            previous = (self.decision, self.factor)
+            if load >= 2:
+                self.decision, self.factor = "pause", self.min_factor
+            elif load >= 1:
+                self.decision, self.factor = "reduce", max(self.min_factor, self.factor * 0.5)
+            elif load < 0.5:
+                self.decision, self.factor = "increase", min(1.0, self.factor * 1.5)
+            else:
+                self.decision = "hold"
+
+            if (self.decision, self.factor) != previous and self.decision != "hold":
+                logger.info(f"Regulador {self.config.host}: {self.decision} (factor {self.factor:.2f}, "
+                            f"Threads_running {threads_running}, retraso {lag})")
+                if self.mongo_logger:
+                    self.mongo_logger.log_throttle_decision({
+                        "host": self.config.host,
+                        "decision": self.decision,
+                        "factor": self.factor,
+                        "threads_running": threads_running,
+                        "replication_lag": lag
+                    })
+
+    def wait(self):
+        """Bloquea mientras el remoto esté saturado"""
+        self.update()
+        while self.decision == "pause":
+            time.sleep(self.sample_interval)
+            self.update()
+
+    def chunk_size(self, base: int) -> int:
+        """Tamaño de bloque permitido según la carga actual"""
+        return max(1, int(base * self.factor))
+
+    def workers(self, base: int) -> int:
+        """Concurrencia permitida según la carga actual"""
+        return max(1, int(round(base * self.factor)))
+
+    @contextmanager
+    def slot(self, max_workers: int, key: Any = None):
+        """
+        Ocupa un lugar de trabajo concurrente contra el remoto, esperando si la concurrencia
+        permitida bajó. Los lugares se cuentan por key (la base), ya que max_workers es el
+        tamaño del pool de esa base: bases concurrentes no se bloquean entre sí.
+        """
+        while True:
+            # El muestreo consulta el remoto (y puede registrar en MongoDB): fuera del candado,
+            # que solo protege los contadores y lee el factor ya calculado
+            self.update()
+            with self._slots:
+                if self._active.get(key, 0) < self.workers(max_workers):
+                    self._active[key] = self._active.get(key, 0) + 1
+                    break
+                self._slots.wait(timeout=self.sample_interval)
+        try:
+            yield
+        finally:
+            with self._slots:
+                self._active[key] -= 1
+                if not self._active[key]:
+                    del self._active[key]
+                self._slots.notify_all()
+
+    def close(self):
+        if self._connection:
+            self._connection.close()
+            self._connection = None
+
+class ConnectionPool:
+    """Pool de conexiones MySQL compartido por los workers de sincronización de una base"""
+    def __init__(self, config: DatabaseConfig, database: str, size: int,
+                 allow_local_infile: bool = False):
+        self.config = config
+        self.database = database
+        pool_name = re.sub(r"[^\w.:\-*$#]", "_", f"sync_{config.host}_{database}")[:64]
+        self.pool = pooling.MySQLConnectionPool(
+            pool_name=pool_name,
+            pool_size=size,
+            host=config.host,
+            port=config.port,
+            user=config.username,
+            password=config.password,
+            database=database,
+            allow_local_infile=allow_local_infile,
+            compress=config.compress
+        )
+
+    def get_connection(self):
+        return self.pool.get_connection()
+
+    def close(self):
+        """Cierra las conexiones inactivas del pool"""
+        self.pool._remove_connections()
+
 class MySQLConnection:
-    def __init__(self, config: DatabaseConfig, database: Optional[str] = None):
+    def __init__(self, config: DatabaseConfig, database: Optional[str] = None,
+                 allow_local_infile: bool = False, pool: Optional[ConnectionPool] = None):
         self.config = config
         self.database = database
+        self.allow_local_infile = allow_local_infile
+        self.pool = pool
         self.connection = None
         self.cursor = None
 
     def connect(self):
         try:
+            if self.pool:
+                # Las conexiones del pool se devuelven al pool en close()
+                self.connection = self.pool.get_connection()
+                self.cursor = self.connection.cursor(dictionary=True)
+                logger.debug(f"Conexión obtenida del pool de {self.config.host}")
+                return True
             self.connection = mysql.connector.connect(
                 host=self.config.host,
                 port=self.config.port,
                 user=self.config.username,
                 password=self.config.password,
-                database=self.database
+                database=self.database,
+                allow_local_infile=self.allow_local_infile,
+                compress=self.config.compress
             )
             self.cursor = self.connection.cursor(dictionary=True)
             logger.info(f"Conexión exitosa a {self.config.host}")
@@ -87,7 +437,8 @@ class MySQLConnection:
             self.cursor.close()
         if self.connection:
             self.connection.close()
-            logger.info("Conexión cerrada")
+            if not self.pool:
+                logger.info("Conexión cerrada")
 
     def __enter__(self):
         self.connect()
@@ -96,21 +447,132 @@ class MySQLConnection:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
-class TableAnalyzer:
+def as_str(value: Any) -> Any:
+    """Decodifica valores bytes devueltos por INFORMATION_SCHEMA en algunas versiones del conector"""
+    return value.decode('utf-8') if isinstance(value, (bytes, bytearray)) else value
+
+def encode_state_value(value: Any) -> Tuple[Optional[str], Optional[str]]:
+    """Serializa un valor de referencia para guardarlo en la tabla de estado"""
+    if value is None:
+        return None, None
+    if isinstance(value, bool):
+        return str(int(value)), 'int'
+    if isinstance(value, int):
+        return str(value), 'int'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' '), 'datetime'
+    if isinstance(value, date):
+        return value.isoformat(), 'date'
+    if isinstance(value, Decimal):
+        return str(value), 'decimal'
+    if isinstance(value, ObjectId):
+        return str(value), 'objectid'
+    return str(as_str(value)), 'str'
+
+def decode_state_value(value: Optional[str], value_type: Optional[str]) -> Any:
+    """Reconstruye un valor de referencia guardado con encode_state_value"""
+    if value is None:
+        return None
+    if value_type == 'int':
+        return int(value)
+    if value_type == 'datetime':
+        return datetime.fromisoformat(value)
+    if value_type == 'date':
+        return date.fromisoformat(value)
+    if value_type == 'decimal':
+        return Decimal(value)
+    if value_type == 'objectid':
+        return ObjectId(value)
+    return value
+
+class SyncState:
+    """Estado persistente de la sincronización en la tabla local SYNC_STATE_TABLE"""
     def __init__(self, connection: MySQLConnection):
         self.connection = connection
 
-    def get_tables(self) -> List[str]:
-        """Obtiene lista de tablas excluyendo vistas"""
-        self.connection.cursor.execute("SHOW FULL TABLES")
-        tables = [row[list(row.keys())[0]] for row in self.connection.cursor.fetchall() 
-                 if row[list(row.keys())[1]] == "BASE TABLE"]
-        return tables
+    def ensure_table(self):
+        """Crea la tabla de estado si no existe (DDL: provoca un commit implícito)"""
+        self.connection.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS `{SYNC_STATE_TABLE}` (
+                state_key VARCHAR(191) NOT NULL PRIMARY KEY,
+                reference_field VARCHAR(64) NULL,
+                last_value MEDIUMTEXT NULL,
+                value_type VARCHAR(16) NULL,
+                verified_at DATETIME NULL,
+                updated_at DATETIME NOT NULL
+            ) ENGINE=InnoDB
+        """)
+
+    def ensure_capacity(self):
+        """
+        Amplía last_value en tablas de estado creadas con VARCHAR(255) o TEXT: los conjuntos
+        GTID del CDC pueden superar esos tamaños (DDL)
+        """
+        self.connection.cursor.execute(
+            "SELECT DATA_TYPE FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'last_value'",
+            (SYNC_STATE_TABLE,))
+        row = self.connection.cursor.fetchone()
+        if row and as_str(row['DATA_TYPE']).lower() in ('varchar', 'text'):
+            self.connection.cursor.execute(f"ALTER TABLE `{SYNC_STATE_TABLE}` MODIFY last_value MEDIUMTEXT NULL")
 
-    def get_table_columns(self, table: str) -> List[Dict[str, Any]]:
-        """Obtiene información de columnas de una tabla"""
-        self.connection.cursor.execute(f"SHOW COLUMNS FROM {table}")
-        return self.connection.cursor.fetchall()
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Obtiene una entrada de estado con su valor ya deserializado"""
+        self.connection.cursor.execute(
+            f"SELECT * FROM `{SYNC_STATE_TABLE}` WHERE state_key = %s", (key,))
+        row = self.connection.cursor.fetchone()
+        if not row:
+            return None
+        row['value'] = decode_state_value(as_str(row['last_value']), as_str(row['value_type']))
+        return row
+
+    def set(self, key: str, value: Any, reference_field: Optional[str] = None, verified: bool = False):
+        """Guarda una entrada de estado sin confirmar, para que viaje en la transacción del llamador"""
+        encoded, value_type = encode_state_value(value)
+        now = datetime.now()
+        self.connection.cursor.execute(f"""
+            INSERT INTO `{SYNC_STATE_TABLE}`
+                (state_key, reference_field, last_value, value_type, verified_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                reference_field = VALUES(reference_field),
+                last_value = VALUES(last_value),
+                value_type = VALUES(value_type),
+                verified_at = COALESCE(VALUES(verified_at), verified_at),
+                updated_at = VALUES(updated_at)
+        """, (key, reference_field, encoded, value_type, now if verified else None, now))
+
+    def delete(self, key: str):
+        """Elimina una entrada de estado sin confirmar"""
+        self.connection.cursor.execute(
+            f"DELETE FROM `{SYNC_STATE_TABLE}` WHERE state_key = %s", (key,))
+
+    def add_keys(self, keys: List[str]):
+        """Registra entradas sin valor (marcas), una fila por clave, sin confirmar"""
+        now = datetime.now()
+        self.connection.cursor.executemany(
+            f"INSERT IGNORE INTO `{SYNC_STATE_TABLE}` (state_key, updated_at) VALUES (%s, %s)",
+            [(key, now) for key in keys])
+
+    def keys_with_prefix(self, prefix: str) -> List[str]:
+        """Claves de estado que empiezan con prefix, en orden (rango sobre la clave primaria)"""
+        after_prefix = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        self.connection.cursor.execute(
+            f"SELECT state_key FROM `{SYNC_STATE_TABLE}` WHERE state_key >= %s AND state_key < %s "
+            f"ORDER BY state_key", (prefix, after_prefix))
+        return [as_str(row['state_key']) for row in self.connection.cursor.fetchall()]
+
+    def delete_keys_through(self, prefix: str, last_key: str):
+        """Elimina, sin confirmar, las claves que empiezan con prefix hasta last_key inclusive"""
+        self.connection.cursor.execute(
+            f"DELETE FROM `{SYNC_STATE_TABLE}` WHERE state_key >= %s AND state_key <= %s", (prefix, last_key))
+
+class TableAnalyzer:
+    def __init__(self, connection: MySQLConnection, cache_dir: Optional[str] = None):
+        self.connection = connection
+        # Directorio del caché de esquema en disco (cadena vacía para deshabilitarlo)
+        self.cache_dir = cache_dir if cache_dir is not None else os.getenv("SYNC_SCHEMA_CACHE_DIR", ".schema_cache")
+        self._schema = None
 
     def find_reference_field(self, columns: List[Dict[str, Any]]) -> Optional[str]:
         """Busca campo de referencia (autoincrement o datetime con NOW)"""
@@ -134,51 +596,332 @@ class TableAnalyzer:
         
         return None
 
-    def get_foreign_keys(self, table: str) -> List[str]:
-        """Obtiene lista de claves foráneas de una tabla"""
-        self.connection.cursor.execute(f"""
-            SELECT COLUMN_NAME
+    @staticmethod
+    def find_snapshot_key(info: Dict[str, Any]) -> Optional[str]:
+        """Clave primaria entera de una sola columna: permite dividir la tabla en rangos"""
+        if len(info['primary_key']) != 1:
+            return None
+        key = info['primary_key'][0]
+        for col in info['columns']:
+            if col['Field'] == key and re.match(r"(tiny|small|medium|big)?int\b", as_str(col.get('Type', '')).lower()):
+                return key
+        return None
+
+    def get_schema_fingerprint(self) -> Dict[str, str]:
+        """Obtiene en una sola consulta una huella del esquema (tablas, columnas, claves e índices)"""
+        self.connection.cursor.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
+                 WHERE TABLE_SCHEMA = DATABASE()) AS tables_count,
+                (SELECT MAX(CREATE_TIME) FROM INFORMATION_SCHEMA.TABLES
+                 WHERE TABLE_SCHEMA = DATABASE()) AS last_create_time,
+                (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION,
+                        COLUMN_TYPE, IS_NULLABLE, COLUMN_DEFAULT, EXTRA, COLUMN_KEY))), 0)
+                 FROM INFORMATION_SCHEMA.COLUMNS
+                 WHERE TABLE_SCHEMA = DATABASE()) AS columns_checksum,
+                (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME,
+                        ORDINAL_POSITION, REFERENCED_TABLE_NAME))), 0)
+                 FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
+                 WHERE TABLE_SCHEMA = DATABASE()) AS keys_checksum,
+                (SELECT COALESCE(SUM(CRC32(CONCAT_WS('|', TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX,
+                        COLUMN_NAME, NON_UNIQUE))), 0)
+                 FROM INFORMATION_SCHEMA.STATISTICS
+                 WHERE TABLE_SCHEMA = DATABASE()) AS indexes_checksum
+        """)
+        row = self.connection.cursor.fetchone()
+        return {key: str(as_str(value)) for key, value in row.items()}
+
+    def load_schema(self) -> Dict[str, Dict[str, Any]]:
+        """Obtiene columnas, claves e índices de todas las tablas con tres consultas a INFORMATION_SCHEMA"""
+        schema = {}
+        self.connection.cursor.execute("""
+            SELECT c.TABLE_NAME, c.COLUMN_NAME AS Field, c.COLUMN_TYPE AS Type,
+                   c.IS_NULLABLE AS `Null`, c.COLUMN_KEY AS `Key`,
+                   c.COLUMN_DEFAULT AS `Default`, c.EXTRA AS Extra
+            FROM INFORMATION_SCHEMA.COLUMNS c
+            JOIN INFORMATION_SCHEMA.TABLES t
+              ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+            WHERE c.TABLE_SCHEMA = DATABASE() AND t.TABLE_TYPE = 'BASE TABLE'
+            ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+        """)
+        for row in self.connection.cursor.fetchall():
+            table = as_str(row.pop('TABLE_NAME'))
+            info = schema.setdefault(table, {
+                'columns': [], 'primary_key': [], 'unique_keys': [],
+                'foreign_keys': [], 'depends_on': [], 'indexes': []
+            })
+            info['columns'].append({key: as_str(value) for key, value in row.items()})
+
+        self.connection.cursor.execute("""
+            SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME
             FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
             WHERE TABLE_SCHEMA = DATABASE()
-            AND TABLE_NAME = '{table}'
-            AND REFERENCED_TABLE_NAME IS NOT NULL
+            ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
         """)
-        return [row['COLUMN_NAME'] for row in self.connection.cursor.fetchall()]
+        for row in self.connection.cursor.fetchall():
+            info = schema.get(as_str(row['TABLE_NAME']))
+            if info is None:
+                continue
+            column = as_str(row['COLUMN_NAME'])
+            referenced = as_str(row['REFERENCED_TABLE_NAME'])
+            if as_str(row['CONSTRAINT_NAME']) == 'PRIMARY':
+                info['primary_key'].append(column)
+            elif referenced:
+                info['foreign_keys'].append(column)
+                if referenced not in info['depends_on']:
+                    info['depends_on'].append(referenced)
+
+        self.connection.cursor.execute("""
+            SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME, NON_UNIQUE
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+            ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """)
+        for row in self.connection.cursor.fetchall():
+            info = schema.get(as_str(row['TABLE_NAME']))
+            if info is None:
+                continue
+            name = as_str(row['INDEX_NAME'])
+            if not info['indexes'] or info['indexes'][-1]['name'] != name:
+                info['indexes'].append({'name': name, 'columns': [], 'unique': not int(row['NON_UNIQUE'])})
+            info['indexes'][-1]['columns'].append(as_str(row['COLUMN_NAME']))
+        for info in schema.values():
+            info['unique_keys'] = [index['columns'] for index in info['indexes']
+                                   if index['unique'] and index['name'] != 'PRIMARY']
+        return schema
+
+    def _cache_path(self) -> str:
+        name = re.sub(r"[^\w.\-]", "_", f"{self.connection.config.host_key}_{self.connection.database}")
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def get_schema(self, refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Devuelve el esquema desde el caché en disco si la huella no cambió; si no, lo recarga"""
+        if self._schema is not None and not refresh:
+            return self._schema
+
+        fingerprint = self.get_schema_fingerprint()
+        if self.cache_dir:
+            try:
+                with open(self._cache_path(), encoding='utf-8') as cache_file:
+                    cached = json.load(cache_file)
+                if cached.get('fingerprint') == fingerprint:
+                    self._schema = cached['tables']
+                    return self._schema
+            except (OSError, ValueError):
+                pass
+
+        schema = self.load_schema()
+        self._schema = schema
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{self._cache_path()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as cache_file:
+                    json.dump({'fingerprint': fingerprint, 'tables': schema}, cache_file, default=str)
+                os.replace(tmp_path, self._cache_path())
+            except OSError as e:
+                logger.warning(f"No se pudo guardar el caché de esquema de {self.connection.database}: {e}")
+        return schema
+
+    def get_key_catalog(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Catálogo de clave primaria y claves únicas de todas las tablas, para ubicar registros por
+        clave, junto con su nivel de dependencias (las tablas hijas tienen un nivel mayor)
+        """
+        schema = self.get_schema()
+        levels = build_dependency_levels([{'name': table, 'depends_on': info['depends_on']}
+                                          for table, info in schema.items()])
+        level_of = {info['name']: number for number, level in enumerate(levels) for info in level}
+        return {table: {'primary_key': info['primary_key'], 'unique_keys': info['unique_keys'],
+                        'level': level_of.get(table, 0)}
+                for table, info in schema.items()}
 
     def analyze_tables(self) -> List[Dict[str, Any]]:
         """Analiza todas las tablas y retorna información estructurada"""
         tables_info = []
-        tables = self.get_tables()
+        schema = self.get_schema()
         
-        for table in tables:
-            columns = self.get_table_columns(table)
-            reference_field = self.find_reference_field(columns)
-            foreign_keys = self.get_foreign_keys(table)
+        for table in sorted(schema):
+            if table == SYNC_STATE_TABLE:
+                continue
+            info = schema[table]
+            reference_field = self.find_reference_field(info['columns'])
             
             if reference_field:  # Solo incluir tablas con campo de referencia válido
                 tables_info.append({
                     'name': table,
                     'reference_field': reference_field,
-                    'foreign_keys': foreign_keys,
-                    'has_foreign_keys': len(foreign_keys) > 0
+                    'foreign_keys': info['foreign_keys'],
+                    'depends_on': info['depends_on'],
+                    'primary_key': info['primary_key'],
+                    'snapshot_key': self.find_snapshot_key(info),
+                    'has_foreign_keys': len(info['foreign_keys']) > 0
                 })
         
         # Ordenar tablas: primero las que no tienen claves foráneas
         return sorted(tables_info, key=lambda x: x['has_foreign_keys'])
 
+class RowInserter:
+    """
+    Motor de inserción por lotes en una tabla local: INSERT multi-fila dimensionados por bytes
+    (bisectados hasta la fila si fallan) o LOAD DATA LOCAL INFILE. Acumula sus contadores en
+    el diccionario stats recibido.
+    """
+    def __init__(self, conn: MySQLConnection, table: str, stats: Dict[str, Any],
+                 insert_mode: Optional[str] = None, batch_bytes: Optional[int] = None,
+                 upsert: bool = False):
+        self.conn = conn
+        self.table = table
+        self.stats = stats
+        # Modo de inserción: 'batch' (INSERT multi-fila) o 'load_data' (LOAD DATA LOCAL INFILE)
+        self.insert_mode = insert_mode or os.getenv("SYNC_INSERT_MODE", "batch")
+        # Presupuesto en bytes de cada INSERT multi-fila (debe quedar bajo max_allowed_packet)
+        self.batch_bytes = batch_bytes or int(os.getenv("SYNC_BATCH_BYTES", str(1024 * 1024)))
+        # INSERT ... ON DUPLICATE KEY UPDATE para reaplicar filas de forma idempotente sin
+        # borrarlas (un REPLACE borra la fila existente y con ella, en cascada, sus hijas)
+        self.upsert = upsert
+        for key in ('rows_processed', 'rows_inserted', 'batches', 'errors'):
+            self.stats.setdefault(key, 0)
+
+    def insert(self, columns: List[str], data: List[List[Any]]):
+        """Inserta filas (listas de valores en el orden de columns)"""
+        # LOAD DATA no admite ON DUPLICATE KEY UPDATE: el upsert siempre va por lotes INSERT
+        if self.insert_mode == 'load_data' and not self.upsert:
+            try:
+                self._load_data(columns, data)
+                return
+            except Error as e:
+                logger.warning(f"LOAD DATA falló en {self.table}, se usan lotes INSERT: {e}")
+
+        for batch in self._split_batches(data):
+            self._insert_batch(columns, batch)
+
+    def _split_batches(self, data: List[List[Any]]) -> Iterator[List[List[Any]]]:
+        """Divide las filas en lotes cuyo tamaño estimado no supera batch_bytes"""
+        batch, batch_size = [], 0
+        for values in data:
+            row_size = estimate_row_bytes(values)
+            if batch and batch_size + row_size > self.batch_bytes:
+                yield batch
+                batch, batch_size = [], 0
+            batch.append(values)
+            batch_size += row_size
+        if batch:
+            yield batch
+
+    def _insert_batch(self, columns: List[str], batch: List[List[Any]]):
+        """Inserta un lote con un único INSERT multi-fila; si falla, lo bisecta hasta aislar las filas con error"""
+        row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+        insert_query = (f"INSERT INTO {self.table} ({', '.join(columns)}) VALUES "
+                        + ", ".join([row_placeholders] * len(batch)))
+        if self.upsert:
+            insert_query += " ON DUPLICATE KEY UPDATE " + ", ".join(f"{col}=VALUES({col})" for col in columns)
+        try:
+            self.conn.cursor.execute(insert_query, [value for values in batch for value in values])
+            self.stats['rows_inserted'] += len(batch)
+            self.stats['rows_processed'] += len(batch)
+            self.stats['batches'] += 1
+        except Error as e:
+            if len(batch) == 1:
+                logger.error(f"Error insertando fila en {self.table}: {e}")
+                self.stats['errors'] += 1
+                self.stats['rows_processed'] += 1
+                return
+            # El INSERT multi-fila es atómico: se reintenta cada mitad por separado
+            middle = len(batch) // 2
+            self._insert_batch(columns, batch[:middle])
+            self._insert_batch(columns, batch[middle:])
+
+    def _load_data(self, columns: List[str], data: List[List[Any]]):
+        """Carga un bloque mediante LOAD DATA LOCAL INFILE desde un archivo temporal"""
+        with tempfile.NamedTemporaryFile("wb", suffix=".tsv", delete=False) as infile:
+            for values in data:
+                infile.write(b"\t".join(to_infile_field(value) for value in values) + b"\n")
+            path = infile.name
+        try:
+            self.conn.cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {self.table} CHARACTER SET binary "
+                f"({', '.join(columns)})", (path,))
+            # Con LOCAL las filas duplicadas se descartan como advertencias
+            rowcount = max(self.conn.cursor.rowcount, 0)
+            loaded = min(rowcount, len(data))
+            # Con LOCAL los errores de conversión también son advertencias: la fila se carga con
+            # el valor truncado o ajustado, por lo que se cuenta como error
+            damaged = min(len(self._warned_rows(len(data))), loaded)
+            self.stats['rows_inserted'] += loaded - damaged
+            self.stats['errors'] += len(data) - loaded + damaged
+            self.stats['rows_processed'] += len(data)
+            self.stats['batches'] += 1
+            if loaded < len(data):
+                logger.error(f"LOAD DATA en {self.table}: {len(data) - loaded} filas descartadas")
+        finally:
+            os.remove(path)
+
+    def _warned_rows(self, total: int) -> set:
+        """Números de fila (1..total) señalados por las advertencias del último LOAD DATA"""
+        self.conn.cursor.execute("SHOW WARNINGS")
+        rows, sample = set(), None
+        for warning in self.conn.cursor.fetchall():
+            message = as_str(warning['Message'])
+            match = re.search(r"at row (\d+)", message)
+            if match and int(match.group(1)) <= total:
+                rows.add(int(match.group(1)))
+                sample = sample or message
+        if rows:
+            logger.error(f"LOAD DATA en {self.table}: {len(rows)} filas cargadas con valores ajustados ({sample})")
+        return rows
+
 class TableSync:
     def __init__(self, remote_conn: MySQLConnection, local_conn: MySQLConnection, 
-                 table_info: Dict[str, Any], mongo_logger: MongoLogger):
+                 table_info: Dict[str, Any], mongo_logger: MongoLogger,
+                 chunk_size: Optional[int] = None, insert_mode: Optional[str] = None,
+                 batch_bytes: Optional[int] = None, pipeline_queue_size: Optional[int] = None,
+                 throttle: Optional[RemoteThrottle] = None, limiter: Optional[HostConnectionLimiter] = None):
         self.remote_conn = remote_conn
         self.local_conn = local_conn
         self.table = table_info['name']
         self.reference_field = table_info['reference_field']
+        # Clave primaria: pagina las filas que comparten el valor límite de un bloque
+        self.primary_key = table_info.get('primary_key') or []
+        # Clave primaria entera que habilita la carga inicial en paralelo (TableSnapshot)
+        self.snapshot_key = table_info.get('snapshot_key') if os.getenv("SYNC_SNAPSHOT", "1") == "1" else None
         self.mongo_logger = mongo_logger
+        # Tamaño del bloque de lectura remota (paginación por clave sobre el campo de referencia)
+        self.chunk_size = chunk_size or int(os.getenv("SYNC_CHUNK_SIZE", "5000"))
+        # Regulador de carga del remoto: reduce el bloque o pausa la lectura si está ocupado
+        self.throttle = throttle
+        # Limitador de conexiones por host: las conexiones extra de TableSnapshot se cuentan en él
+        self.limiter = limiter
+        # Marca de agua persistida; cada cierto tiempo se verifica contra MAX() local
+        self.state = SyncState(local_conn)
+        self.state_key = f"table:{self.table}"
+        # Copia única de las filas con referencia NULL en la primera carga: pending / done
+        self.null_state_key = f"{self.state_key}:nulls"
+        self.verify_interval = timedelta(hours=float(os.getenv("SYNC_WATERMARK_VERIFY_HOURS", "24")))
+        # Bloques en vuelo entre el hilo lector (remoto) y el escritor (local); 0 deshabilita el pipeline
+        self.pipeline_queue_size = (pipeline_queue_size if pipeline_queue_size is not None
+                                    else int(os.getenv("SYNC_PIPELINE_QUEUE_SIZE", "0")))
         self.stats = {
             'rows_processed': 0,
             'rows_inserted': 0,
+            'chunks': 0,
+            'batches': 0,
+            'fetch_stall_seconds': 0.0,
+            'insert_stall_seconds': 0.0,
+            'bytes_transferred': 0,
+            'elapsed_seconds': 0.0,
+            'rows_per_second': 0.0,
+            # Segundos por fase: watermark, fetch, insert, commit (en modo pipeline,
+            # fetch transcurre en paralelo con insert y commit)
+            'timings': {},
             'errors': 0
         }
+        self.inserter = RowInserter(local_conn, self.table, self.stats, insert_mode, batch_bytes)
+        # Lectura remota con cursor de tuplas: evita armar un dict por fila solo para volver a
+        # convertirlo en lista al insertar; el orden de columnas sale de cursor.description
+        self.remote_cursor = None
+        self.columns = None
+        self.reference_index = None
 
     def get_max_local_value(self) -> Any:
         """Obtiene el valor máximo del campo de referencia en la tabla local"""
@@ -186,159 +929,907 @@ class TableSync:
         result = self.local_conn.cursor.fetchone()
         return result['max_value'] if result and result['max_value'] is not None else None
 
+    def get_watermark(self) -> Any:
+        """Obtiene el último valor sincronizado desde la tabla de estado, verificándolo contra MAX() si corresponde"""
+        entry = self.state.get(self.state_key)
+        if entry and as_str(entry['reference_field']) == self.reference_field:
+            verified_at = entry['verified_at']
+            if verified_at and datetime.now() - verified_at < self.verify_interval:
+                return entry['value']
+
+        # Primera sincronización de la tabla o verificación periódica: MAX() local
+        max_value = self.get_max_local_value()
+        if entry and entry['value'] != max_value:
+            logger.warning(f"Marca de agua de {self.table} ({entry['value']}) difiere de MAX local ({max_value}); se usa MAX")
+        self.state.set(self.state_key, max_value, self.reference_field, verified=True)
+        self.local_conn.connection.commit()
+        return max_value
+
+    def _execute_remote(self, query: str, params: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        """Ejecuta una lectura remota con el cursor de tuplas y registra el orden de columnas"""
+        if self.remote_cursor is None:
+            self.remote_cursor = self.remote_conn.connection.cursor()
+        self.remote_cursor.execute(query, params)
+        if self.columns is None:
+            self.columns = [as_str(description[0]) for description in self.remote_cursor.description]
+            self.reference_index = self.columns.index(self.reference_field)
+        return self.remote_cursor.fetchall()
+
+    def mark_null_references(self):
+        """Primera carga de la tabla: deja pendiente la copia de las filas con referencia NULL"""
+        if self.state.get(self.null_state_key) is None:
+            self.state.set(self.null_state_key, "pending", self.reference_field)
+            self.local_conn.connection.commit()
+
+    def copy_null_references(self):
+        """
+        Copia una sola vez las filas remotas con campo de referencia NULL, que ni la paginación
+        por clave (> último valor) ni la carga inicial (<= límite) alcanzan. Se leen por bloques
+        y se confirman en una sola transacción junto con la marca de copia realizada.
+        """
+        entry = self.state.get(self.null_state_key)
+        if not entry or entry['value'] != "pending":
+            return
+        cursor = self.remote_conn.connection.cursor()
+        try:
+            cursor.execute(f"SELECT * FROM {self.table} WHERE {self.reference_field} IS NULL")
+            columns = [as_str(description[0]) for description in cursor.description]
+            copied = 0
+            while True:
+                if self.throttle:
+                    self.throttle.wait()
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                self.insert_rows(columns, rows)
+                copied += len(rows)
+        finally:
+            cursor.close()
+        self.state.set(self.null_state_key, "done", self.reference_field)
+        self.local_conn.connection.commit()
+        if copied:
+            logger.info(f"Tabla {self.table}: {copied} filas con {self.reference_field} NULL copiadas en la primera carga")
+
+    def fetch_chunk(self, last_value: Any, limit: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        """Obtiene el siguiente bloque de filas remotas con campo de referencia mayor a last_value"""
+        limit = limit or self.chunk_size
+        if last_value is not None:
+            query = (f"SELECT * FROM {self.table} WHERE {self.reference_field} > %s "
+                     f"ORDER BY {self.reference_field} LIMIT %s")
+            return self._execute_remote(query, (last_value, limit))
+        query = (f"SELECT * FROM {self.table} WHERE {self.reference_field} IS NOT NULL "
+                 f"ORDER BY {self.reference_field} LIMIT %s")
+        return self._execute_remote(query, (limit,))
+
+    def iter_boundary(self, boundary: Any, limit: int) -> Iterator[List[Tuple[Any, ...]]]:
+        """Recorre por páginas de clave primaria todas las filas remotas con el valor boundary"""
+        if not self.primary_key:
+            # Sin clave primaria no hay un orden estable para paginar: se leen de una vez
+            rows = self._execute_remote(
+                f"SELECT * FROM {self.table} WHERE {self.reference_field} = %s", (boundary,))
+            if len(rows) > limit:
+                logger.warning(f"Tabla {self.table} sin clave primaria: {len(rows)} filas con "
+                               f"{self.reference_field} = {boundary} leídas en un solo bloque")
+            if rows:
+                yield rows
+            return
+
+        key_columns = ", ".join(f"`{col}`" for col in self.primary_key)
+        after = None
+        while True:
+            if self.throttle:
+                self.throttle.wait()
+            if after is None:
+                condition, params = "", (boundary, limit)
+            else:
+                placeholders = ", ".join(["%s"] * len(after))
+                condition, params = f" AND ({key_columns}) > ({placeholders})", (boundary, *after, limit)
+            with timed(self.stats['timings'], 'fetch'):
+                rows = self._execute_remote(
+                    f"SELECT * FROM {self.table} WHERE {self.reference_field} = %s{condition} "
+                    f"ORDER BY {key_columns} LIMIT %s", params)
+            if rows:
+                yield rows
+            if len(rows) < limit:
+                return
+            after = [rows[-1][self.columns.index(col)] for col in self.primary_key]
+
+    def insert_rows(self, columns: List[str], rows: List[Tuple[Any, ...]]):
+        """Inserta un bloque de filas en la tabla local usando el modo de inserción configurado"""
+        self.stats['bytes_transferred'] += sum(estimate_row_bytes(values) for values in rows)
+        self.inserter.insert([f"`{col}`" for col in columns], rows)
+
+    def iter_chunks(self, last_value: Any) -> Iterator[Tuple[List[Tuple[Any, ...]], Any]]:
+        """
+        Recorre los bloques de registros nuevos de la tabla remota a partir de last_value, junto
+        con la marca de agua a confirmar con cada uno (None: el bloque se confirma con el siguiente)
+        """
+        while True:
+            limit = self.chunk_size
+            if self.throttle:
+                self.throttle.wait()
+                limit = self.throttle.chunk_size(self.chunk_size)
+            with timed(self.stats['timings'], 'fetch'):
+                rows = self.fetch_chunk(last_value, limit)
+            if not rows:
+                return
+            if len(rows) < limit:
+                yield rows, rows[-1][self.reference_index]
+                return
+
+            # Bloque completo: el último valor puede repetirse fuera del LIMIT (campos datetime).
+            # Sus filas se traen por páginas que se confirman juntas con la última, para no
+            # dejar la marca de agua en un valor copiado a medias
+            boundary = rows[-1][self.reference_index]
+            rows = [row for row in rows if row[self.reference_index] != boundary]
+            if rows:
+                yield rows, rows[-1][self.reference_index]
+            previous = []
+            for page in self.iter_boundary(boundary, limit):
+                if previous:
+                    yield previous, None
+                previous = page
+            yield previous, boundary
+            last_value = boundary
+
+    def write_chunk(self, rows: List[Tuple[Any, ...]], watermark: Any):
+        """Inserta un bloque y, si trae marca de agua, lo confirma junto con ella"""
+        if rows:
+            with timed(self.stats['timings'], 'insert'):
+                self.insert_rows(self.columns, rows)
+        if watermark is None:
+            return
+
+        # Confirmar por bloque junto con la marca de agua: si la ejecución se interrumpe,
+        # la próxima sincronización retoma desde el último bloque confirmado
+        with timed(self.stats['timings'], 'commit'):
+            self.state.set(self.state_key, watermark, self.reference_field)
+            self.local_conn.connection.commit()
+        self.stats['chunks'] += 1
+
+    def _sync_pipelined(self, last_value: Any):
+        """
+        Lee el remoto en un hilo propio mientras el hilo actual escribe en local, a través de
+        una cola acotada. Registra cuánto espera cada etapa: el lector espera cuando la cola
+        está llena (cuello de botella local) y el escritor cuando está vacía (cuello remoto).
+        """
+        chunks = queue.Queue(maxsize=self.pipeline_queue_size)
+        stop = threading.Event()
+
+        def put(item: Any):
+            started = time.monotonic()
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            self.stats['fetch_stall_seconds'] += time.monotonic() - started
+
+        def reader():
+            try:
+                for chunk in self.iter_chunks(last_value):
+                    put(chunk)
+                    if stop.is_set():
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=reader, name=f"sync-reader-{self.table}", daemon=True)
+        thread.start()
+        try:
+            while True:
+                started = time.monotonic()
+                item = chunks.get()
+                self.stats['insert_stall_seconds'] += time.monotonic() - started
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                self.write_chunk(*item)
+        finally:
+            stop.set()
+            thread.join()
+
     def sync_table(self):
-        """Sincroniza una tabla específica"""
+        """Sincroniza una tabla específica por bloques, confirmando cada bloque"""
         logger.info(f"Iniciando sincronización de tabla: {self.table}")
+        started = time.monotonic()
         
         try:
-            max_local_value = self.get_max_local_value()
+            if self.snapshot_key:
+                snapshot = TableSnapshot(self)
+                if snapshot.pending():
+                    self.mark_null_references()
+                    with timed(self.stats['timings'], 'snapshot'):
+                        snapshot.run()
+
+            with timed(self.stats['timings'], 'watermark'):
+                last_value = self.get_watermark()
+            if last_value is None:
+                self.mark_null_references()
+            self.copy_null_references()
             
-            # Obtener registros nuevos de la tabla remota
-            if max_local_value is not None:
-                query = f"SELECT * FROM {self.table} WHERE {self.reference_field} > %s"
-                self.remote_conn.cursor.execute(query, (max_local_value,))
+            if self.pipeline_queue_size > 0:
+                self._sync_pipelined(last_value)
             else:
-                self.remote_conn.cursor.execute(f"SELECT * FROM {self.table}")
+                for rows, watermark in self.iter_chunks(last_value):
+                    self.write_chunk(rows, watermark)
             
-            new_rows = self.remote_conn.cursor.fetchall()
-            
-            if new_rows:
-                # Preparar inserción de registros nuevos
-                columns = list(new_rows[0].keys())
-                placeholders = ", ".join(["%s"] * len(columns))
-                insert_query = f"INSERT INTO {self.table} ({', '.join(columns)}) VALUES ({placeholders})"
-                
-                # Insertar registros
-                for row in new_rows:
-                    try:
-                        data = [row[col] for col in columns]
-                        self.local_conn.cursor.execute(insert_query, data)
-                        self.stats['rows_inserted'] += 1
-                    except Error as e:
-                        logger.error(f"Error insertando fila en {self.table}: {e}")
-                        self.stats['errors'] += 1
-                    finally:
-                        self.stats['rows_processed'] += 1
-                
-                self.local_conn.connection.commit()
-                logger.info(f"Tabla {self.table} sincronizada: {self.stats['rows_inserted']} filas insertadas")
+            if self.stats['rows_processed']:
+                logger.info(f"Tabla {self.table} sincronizada: {self.stats['rows_inserted']} filas insertadas "
+                            f"en {self.stats['chunks']} bloques ({time.monotonic() - started:.2f}s)")
+                if self.pipeline_queue_size > 0:
+                    logger.info(f"Tabla {self.table} esperas: lectura remota {self.stats['fetch_stall_seconds']:.2f}s, "
+                                f"escritura local {self.stats['insert_stall_seconds']:.2f}s")
             
         except Error as e:
             logger.error(f"Error sincronizando tabla {self.table}: {e}")
             raise
+        finally:
+            if self.remote_cursor is not None:
+                self.remote_cursor.close()
+                self.remote_cursor = None
+            elapsed = time.monotonic() - started
+            self.stats['elapsed_seconds'] = elapsed
+            self.stats['rows_per_second'] = self.stats['rows_processed'] / elapsed if elapsed > 0 else 0.0
+
+class TableSnapshot:
+    """
+    Carga inicial de una tabla con clave primaria entera: divide el rango MIN/MAX de la clave
+    en porciones que se copian en paralelo, cada una en una transacción remota WITH CONSISTENT
+    SNAPSHOT. Un worker usa las conexiones de la propia tabla y los demás abren conexiones
+    extra, que se reservan sin esperar en el limitador de conexiones por host. El avance de cada porción se guarda en la tabla de estado
+    con cada bloque, por lo que una carga interrumpida continúa donde quedó. Solo se copian las
+    filas con campo de referencia hasta el máximo remoto al inicio; las posteriores quedan para
+    la sincronización incremental, que arranca desde ese valor, y las de referencia NULL las
+    copia TableSync una sola vez al terminar la carga.
+    """
+    def __init__(self, table_sync: 'TableSync', workers: Optional[int] = None, slices: Optional[int] = None):
+        self.table_sync = table_sync
+        self.table = table_sync.table
+        self.key = table_sync.snapshot_key
+        self.reference_field = table_sync.reference_field
+        self.state = table_sync.state
+        self.remote_config = table_sync.remote_conn.config
+        self.local_config = table_sync.local_conn.config
+        # Las bases remota y local pueden tener nombres distintos
+        self.remote_database = table_sync.remote_conn.database
+        self.local_database = table_sync.local_conn.database
+        self.workers = workers or int(os.getenv("SYNC_SNAPSHOT_WORKERS", "4"))
+        # Más porciones que workers reparte mejor los rangos con densidades distintas
+        self.slices = slices or int(os.getenv("SYNC_SNAPSHOT_SLICES", "16"))
+        self.state_prefix = f"snapshot:{self.table}"
+        self._stats_lock = threading.Lock()
+
+    def pending(self) -> bool:
+        """Hay que (seguir) cargando si hay una carga en curso o si la tabla local está vacía"""
+        entry = self.state.get(self.table_sync.state_key)
+        if entry and entry['value'] is not None:
+            return False
+        if self.state.get(f"{self.state_prefix}:bound"):
+            return True
+        local_conn = self.table_sync.local_conn
+        local_conn.cursor.execute(f"SELECT 1 AS found FROM `{self.table}` LIMIT 1")
+        empty = local_conn.cursor.fetchone() is None
+        local_conn.connection.commit()
+        return empty
+
+    def get_plan(self) -> Optional[Tuple[Any, int, int, int]]:
+        """Límite del campo de referencia y rango de claves de la carga (se fija al iniciarla)"""
+        bound = self.state.get(f"{self.state_prefix}:bound")
+        key_range = self.state.get(f"{self.state_prefix}:range")
+        if bound and key_range:
+            low, high, slices = (int(part) for part in key_range['value'].split(":"))
+            return bound['value'], low, high, slices
+
+        remote_conn = self.table_sync.remote_conn
+        remote_conn.cursor.execute(
+            f"SELECT MIN(`{self.key}`) AS min_key, MAX(`{self.key}`) AS max_key, "
+            f"MAX(`{self.reference_field}`) AS max_value FROM `{self.table}`")
+        row = remote_conn.cursor.fetchone()
+        remote_conn.connection.commit()
+        if not row or row['min_key'] is None or row['max_value'] is None:
+            return None
+        low, high = int(row['min_key']), int(row['max_key'])
+        slices = max(1, min(self.slices, high - low + 1))
+        # Se fija el rango de claves para no depender de MIN/MAX al reanudar
+        self.state.set(f"{self.state_prefix}:range", f"{low}:{high}:{slices}")
+        self.state.set(f"{self.state_prefix}:bound", row['max_value'], self.reference_field)
+        self.table_sync.local_conn.connection.commit()
+        return row['max_value'], low, high, slices
+
+    def run(self) -> bool:
+        """Ejecuta (o reanuda) la carga; devuelve False si el remoto no tiene filas para copiar"""
+        plan = self.get_plan()
+        if not plan:
+            return False
+        bound, low, high, slices = plan
+        # Porción i: claves en (boundaries[i], boundaries[i + 1]]
+        span = high - low + 1
+        boundaries = [low - 1 + (span * index) // slices for index in range(slices + 1)]
+        progress = {}
+        for index in range(slices):
+            entry = self.state.get(f"{self.state_prefix}:{index}")
+            progress[index] = entry['value'] if entry else None
+
+        pending = [index for index in range(slices)
+                   if progress[index] is None or progress[index] < boundaries[index + 1]]
+        # Carriles de trabajo: el primero reutiliza las conexiones de la tabla (ya reservadas);
+        # cada carril extra abre un par remoto/local que se cuenta en el limitador
+        wanted = max(0, min(self.workers, len(pending)) - 1)
+        hosts = [self.remote_config.host_key, self.local_config.host_key]
+        limiter = self.table_sync.limiter
+        extra = limiter.try_acquire(hosts, wanted) if limiter else wanted
+        lanes = queue.Queue()
+        lanes.put((self.table_sync.remote_conn, self.table_sync.local_conn))
+        for _ in range(extra):
+            lanes.put(None)
+        logger.info(f"Carga inicial de {self.table}: {len(pending)} de {slices} porciones pendientes "
+                    f"(claves {low}-{high}, {self.reference_field} <= {bound}, {extra + 1} workers)")
+        try:
+            with ThreadPoolExecutor(max_workers=extra + 1) as executor:
+                futures = [executor.submit(self.copy_slice, lanes, index, boundaries[index],
+                                           boundaries[index + 1], progress[index], bound)
+                           for index in pending]
+                wait(futures)
+                for future in futures:
+                    future.result()
+        finally:
+            if limiter:
+                limiter.release(hosts, extra)
+
+        # Carga completa: la sincronización incremental sigue desde el límite de referencia
+        self.table_sync.state.set(self.table_sync.state_key, bound, self.reference_field, verified=True)
+        keys = [f"{self.state_prefix}:bound", f"{self.state_prefix}:range"]
+        for key in keys + [f"{self.state_prefix}:{index}" for index in range(slices)]:
+            self.state.delete(key)
+        self.table_sync.local_conn.connection.commit()
+        logger.info(f"Carga inicial de {self.table} completa")
+        return True
+
+    def copy_slice(self, lanes: 'queue.Queue', index: int, low: int, high: int, start: Optional[int], bound: Any):
+        """Copia una porción con las conexiones de un carril libre (o un par nuevo si el carril es None)"""
+        lane = lanes.get()
+        try:
+            if lane is not None:
+                self._copy_slice(lane[0], lane[1], index, low, high, start, bound)
+                return
+            allow_local_infile = self.table_sync.inserter.insert_mode == "load_data"
+            with MySQLConnection(self.remote_config, self.remote_database) as remote_conn, \
+                 MySQLConnection(self.local_config, self.local_database, allow_local_infile) as local_conn:
+                self._copy_slice(remote_conn, local_conn, index, low, high, start, bound)
+        finally:
+            lanes.put(lane)
+
+    def _copy_slice(self, remote_conn: MySQLConnection, local_conn: MySQLConnection, index: int,
+                    low: int, high: int, start: Optional[int], bound: Any):
+        """Copia las claves de (low, high] a partir de start, confirmando el avance por bloque"""
+        table_sync = self.table_sync
+        stats = {'rows_processed': 0, 'rows_inserted': 0, 'batches': 0, 'errors': 0}
+        timings = {}
+        # Las porciones se copian en cualquier orden: referencias a la misma tabla o a
+        # filas aún no copiadas no deben rechazarse
+        local_conn.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        try:
+            remote_conn.connection.start_transaction(consistent_snapshot=True, readonly=True)
+            state = SyncState(local_conn)
+            inserter = RowInserter(local_conn, f"`{self.table}`", stats, table_sync.inserter.insert_mode,
+                                   table_sync.inserter.batch_bytes)
+            # Cursor de tuplas, como en TableSync: las filas se insertan tal como llegan
+            cursor = remote_conn.connection.cursor()
+            last_key = start if start is not None else low
+            while True:
+                limit = table_sync.chunk_size
+                if table_sync.throttle:
+                    table_sync.throttle.wait()
+                    limit = table_sync.throttle.chunk_size(table_sync.chunk_size)
+                with timed(timings, 'fetch'):
+                    cursor.execute(
+                        f"SELECT * FROM `{self.table}` WHERE `{self.key}` > %s AND `{self.key}` <= %s "
+                        f"AND `{self.reference_field}` <= %s ORDER BY `{self.key}` LIMIT %s",
+                        (last_key, high, bound, limit))
+                    rows = cursor.fetchall()
+                if not rows:
+                    break
+                columns = [as_str(description[0]) for description in cursor.description]
+                with timed(timings, 'insert'):
+                    inserter.insert([f"`{col}`" for col in columns], rows)
+                last_key = rows[-1][columns.index(self.key)]
+                with timed(timings, 'commit'):
+                    state.set(f"{self.state_prefix}:{index}", last_key)
+                    local_conn.connection.commit()
+                with self._stats_lock:
+                    table_sync.stats['bytes_transferred'] += sum(estimate_row_bytes(values) for values in rows)
+                    table_sync.stats['chunks'] += 1
+                if len(rows) < limit:
+                    break
+            cursor.close()
+            remote_conn.connection.rollback()
+
+            # Porción terminada: su avance queda en el extremo superior
+            state.set(f"{self.state_prefix}:{index}", high)
+            local_conn.connection.commit()
+        finally:
+            # Las conexiones de la tabla se siguen usando después de la carga inicial
+            if remote_conn.connection.in_transaction:
+                remote_conn.connection.rollback()
+            local_conn.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+        with self._stats_lock:
+            for key, value in stats.items():
+                table_sync.stats[key] += value
+            for phase, seconds in timings.items():
+                table_sync.stats['timings'][phase] = table_sync.stats['timings'].get(phase, 0.0) + seconds
+
+def create_changelog_client() -> MongoClient:
+    """Crea el cliente del MongoDB remoto que contiene el changelog"""
+    return MongoClient(
+        host=os.getenv("MONGOR_HOST", "localhost"),
+        username=os.getenv("MONGOR_USERNAME"),
+        password=os.getenv("MONGOR_PASSWORD")
+    )
 
 class ChangelogSynchronizer:
-    def __init__(self, database: str):
+    # Clave en la tabla de estado local con el _id del último cambio aplicado
+    STATE_KEY = "changelog"
+    # _id ya aplicados dentro de la ventana de relectura: una entrada por _id con este prefijo
+    APPLIED_PREFIX = "changelog:applied:"
+
+    def __init__(self, database: str, client: Optional[MongoClient] = None,
+                 batch_size: Optional[int] = None,
+                 key_catalog: Optional[Dict[str, Dict[str, Any]]] = None):
         self.database = database
-        # Conectar al MongoDB remoto que contiene el changelog
-        self.client = MongoClient(
-            host=os.getenv("MONGOR_HOST", "localhost"),
-            username=os.getenv("MONGOR_USERNAME"),
-            password=os.getenv("MONGOR_PASSWORD")
-        )
-        self.db = self.client.teccam_mongo
-        self.changelog = self.db.changelog
+        # Clave primaria / claves únicas por tabla (TableAnalyzer.get_key_catalog)
+        self.key_catalog = key_catalog or {}
+        # Sentencias armadas por (tabla, columnas, columnas clave, modo)
+        self._statements = {}
+        self._warned_tables = set()
+        # Cliente del MongoDB remoto con el changelog (se puede compartir entre bases); si no se
+        # recibe, se crea al primer uso: el CDC por binlog solo usa la aplicación de cambios
+        self._client = client
+        # Cantidad máxima de cambios leídos y aplicados por lote
+        self.batch_size = batch_size or int(os.getenv("CHANGELOG_BATCH_SIZE", "1000"))
+        # Modo de aplicación: 'update' (UPDATE por lotes) o 'upsert' (INSERT ... ON DUPLICATE KEY UPDATE)
+        self.apply_mode = os.getenv("CHANGELOG_APPLY_MODE", "update")
+        # Claves por sentencia DELETE ... WHERE clave IN (...)
+        self.delete_batch_size = int(os.getenv("CHANGELOG_DELETE_BATCH_SIZE", "500"))
+        # Los _id los genera cada cliente: un cambio con _id menor puede hacerse visible después
+        # de uno mayor ya aplicado. Cada lectura repasa esta ventana anterior a la posición
+        self.overlap = timedelta(seconds=float(os.getenv("CHANGELOG_OVERLAP_SECONDS", "60")))
         self.stats = {
             'updates_processed': 0,
+            'updates_coalesced': 0,
             'updates_applied': 0,
+            'deletes_applied': 0,
+            'batches': 0,
             'errors': 0
         }
-        
-    def get_recent_changes(self, minutes: int = 2) -> List[Dict[str, Any]]:
-        """Obtiene cambios recientes del changelog (últimos X minutos)"""
-        cutoff_time = datetime.now() - timedelta(minutes=minutes)
-        # Convertir a string de fecha para comparación
-        cutoff_str = cutoff_time.strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Filtrar por base de datos y tiempo
+
+    @property
+    def changelog(self):
+        if self._client is None:
+            self._client = create_changelog_client()
+        return self._client.teccam_mongo.changelog
+
+    def get_resume_position(self, state: SyncState) -> ObjectId:
+        """Obtiene el _id del último cambio aplicado en esta base"""
+        entry = state.get(self.STATE_KEY)
+        if entry and entry['value'] is not None:
+            return entry['value']
+        # Sin posición previa se arranca desde la ventana histórica de 2 minutos
+        return ObjectId.from_datetime(datetime.now(timezone.utc) - timedelta(minutes=2))
+
+    def get_changes_after(self, last_id: ObjectId) -> List[Dict[str, Any]]:
+        """Obtiene el siguiente lote de cambios posteriores a last_id, en orden de _id"""
         query = {
             "base_datos": self.database,
-            "fecha_operacion": {"$gte": cutoff_str}
+            "_id": {"$gt": last_id}
         }
-        
-        # Ordenar por fecha ascendente para procesar en orden cronológico
-        changes = list(self.changelog.find(query).sort("fecha_operacion", 1))
-        
-        logger.info(f"Encontrados {len(changes)} cambios recientes en {self.database}")
-        return changes
+        return list(self.changelog.find(query).sort("_id", 1).limit(self.batch_size))
+
+    def window_start(self, last_id: ObjectId) -> ObjectId:
+        """Primer _id posible de la ventana de relectura anterior a last_id"""
+        return ObjectId.from_datetime(last_id.generation_time - self.overlap)
+
+    def consume(self, local_conn: MySQLConnection):
+        """
+        Aplica los cambios nuevos del changelog por lotes. Como los _id no llegan en orden de
+        confirmación, la lectura empieza CHANGELOG_OVERLAP_SECONDS antes de la posición y omite
+        los _id ya aplicados de esa ventana, que se guardan (una fila por _id, borrando las que
+        salen de la ventana) junto con la posición en la misma transacción que los cambios de
+        cada lote. Así cada cambio se aplica una sola vez si se
+        hace visible dentro de la ventana; uno que aparezca más tarde que eso se pierde. Tras
+        una caída el consumo continúa desde el último lote confirmado.
+        """
+        state = SyncState(local_conn)
+        last_id = self.get_resume_position(state)
+        applied = {key[len(self.APPLIED_PREFIX):] for key in state.keys_with_prefix(self.APPLIED_PREFIX)}
+
+        position = self.window_start(last_id)
+        while True:
+            changes = self.get_changes_after(position)
+            if not changes:
+                break
+            position = changes[-1]['_id']
+
+            new_changes = [change for change in changes if str(change['_id']) not in applied]
+            if new_changes:
+                self.apply_changes_to_local(new_changes, local_conn)
+                last_id = max(last_id, max(change['_id'] for change in new_changes))
+                new_ids = [str(change['_id']) for change in new_changes]
+                state.add_keys([self.APPLIED_PREFIX + change_id for change_id in new_ids])
+                # Solo se recuerdan los _id que la próxima lectura vuelve a ver; el hex de un
+                # ObjectId ordena igual que el _id, así que la ventana es un rango de claves
+                start = str(self.window_start(last_id))
+                state.delete_keys_through(self.APPLIED_PREFIX, self.APPLIED_PREFIX + start)
+                applied.update(new_ids)
+                applied = {change_id for change_id in applied if change_id > start}
+                state.set(self.STATE_KEY, last_id)
+                local_conn.connection.commit()
+                self.stats['batches'] += 1
+
+            if len(changes) < self.batch_size:
+                break
+
+        if self.stats['updates_processed']:
+            logger.info(f"Encontrados {self.stats['updates_processed']} cambios nuevos en {self.database} "
+                        f"({self.stats['batches']} lotes)")
     
-    def apply_changes_to_local(self, changes: List[Dict[str, Any]], local_conn: MySQLConnection):
-        """Aplica los cambios del changelog a la base de datos local"""
+    def coalesce_changes(self, changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Reduce los cambios a uno por registro (tabla, id_registro). Los estados pueden traer solo
+        las columnas modificadas, así que los estado_actual se combinan en orden del changelog;
+        un DELETE descarta lo acumulado y los cambios posteriores empiezan de cero.
+        """
+        latest = {}
         for change in changes:
+            operation = change.get("operacion")
+            table = change.get("tabla")
+            record_id = change.get("id_registro")
+
+            if not all([operation, table, record_id]):
+                logger.warning(f"Registro de cambio incompleto: {change}")
+                continue
+
+            self.stats['updates_processed'] += 1
+            key = (table, str(record_id))
+            if key in latest:
+                self.stats['updates_coalesced'] += 1
+                previous = latest.pop(key)
+                if (operation == "UPDATE" and previous["operacion"] == "UPDATE"
+                        and "estado_actual" in previous and "estado_actual" in change):
+                    merged = dict(previous["estado_actual"])
+                    merged.update(change["estado_actual"])
+                    change = dict(change, estado_actual=merged)
+            latest[key] = change
+        return list(latest.values())
+
+    def apply_changes_to_local(self, changes: List[Dict[str, Any]], local_conn: MySQLConnection):
+        """
+        Aplica los cambios del changelog a la base de datos local: colapsa cada registro a un
+        solo cambio y agrupa las actualizaciones por tabla y conjunto de columnas, para
+        ejecutarlas por lotes. Los borrados se agrupan por tabla y se aplican después, de las
+        tablas hijas a las padres para respetar las claves foráneas. La confirmación la hace el
+        llamador (un commit por lote).
+        """
+        groups = {}
+        deletes = {}
+        for change in self.coalesce_changes(changes):
             try:
-                operation = change.get("operacion")
-                table = change.get("tabla")
-                record_id = change.get("id_registro")
-                
-                if not all([operation, table, record_id]):
-                    logger.warning(f"Registro de cambio incompleto: {change}")
-                    continue
-                
-                self.stats['updates_processed'] += 1
-                
-                if operation == "UPDATE" and "estado_actual" in change:
-                    self._apply_update(local_conn, table, record_id, change["estado_actual"])
-                    
-                # También podríamos manejar DELETE en el futuro si es necesario
+                if change["operacion"] == "UPDATE" and "estado_actual" in change:
+                    prepared = self._prepare_update(change["tabla"], change["id_registro"], change["estado_actual"])
+                    if prepared:
+                        columns, key_columns, values = prepared
+                        groups.setdefault((change["tabla"], columns, key_columns), []).append(values)
+                elif change["operacion"] == "DELETE":
+                    # La clave compuesta se toma del último estado conocido del registro
+                    known_state = change.get("estado_anterior") or change.get("estado_actual") or {}
+                    key_columns, key_values = self._resolve_key_or_default(
+                        change["tabla"], change["id_registro"], known_state)
+                    deletes.setdefault((change["tabla"], key_columns), []).append(key_values)
                 
             except Exception as e:
                 logger.error(f"Error al aplicar cambio {change.get('_id')}: {e}")
                 self.stats['errors'] += 1
-    
-    def _apply_update(self, conn: MySQLConnection, table: str, record_id: Any, current_state: Dict[str, Any]):
-        """Aplica una actualización a un registro existente"""
+
+        # Cursor preparado: cada grupo se compila una vez en el servidor y se ejecuta por fila
+        cursor = local_conn.connection.cursor(prepared=True)
+        try:
+            for (table, columns, key_columns), rows in groups.items():
+                self._apply_update_group(local_conn, cursor, table, columns, key_columns, rows)
+        finally:
+            cursor.close()
+
+        for (table, key_columns), keys in sorted(deletes.items(), reverse=True,
+                                                 key=lambda item: self.key_catalog.get(item[0][0], {}).get('level', 0)):
+            for start in range(0, len(keys), self.delete_batch_size):
+                self._apply_delete_batch(local_conn, table, key_columns, keys[start:start + self.delete_batch_size])
+
+    def resolve_key(self, table: str, record_id: Any,
+                    current_state: Dict[str, Any]) -> Optional[Tuple[Tuple[str, ...], List[Any]]]:
+        """
+        Determina las columnas y valores que identifican al registro usando el catálogo de claves:
+        la clave primaria (id_registro si es de una columna, o los valores del estado si es
+        compuesta) o, si no alcanza, una clave única presente completa en el estado.
+        """
+        keys = self.key_catalog.get(table)
+        if not keys:
+            return None
+        primary_key = keys['primary_key']
+        if len(primary_key) == 1:
+            return (primary_key[0],), [record_id]
+        candidates = ([primary_key] if primary_key else []) + keys['unique_keys']
+        for key_columns in candidates:
+            if all(col in current_state for col in key_columns):
+                return tuple(key_columns), [current_state[col] for col in key_columns]
+        return None
+
+    def _prepare_update(self, table: str, record_id: Any,
+                        current_state: Dict[str, Any]) -> Optional[Tuple[Tuple[str, ...], Tuple[str, ...], List[Any]]]:
+        """Obtiene columnas, columnas clave y valores (con la clave al final para el WHERE) de una actualización"""
+        # Obtener todas las columnas del estado actual
+        columns = []
+        values = []
+        
+        # Filtramos los campos que no son parte de la tabla (como _id de MongoDB)
+        for key, value in current_state.items():
+            if not key.startswith('_'):
+                columns.append(key)
+                values.append(value)
+        
+        if not columns:
+            logger.warning(f"No hay columnas para actualizar en la tabla {table}, registro {record_id}")
+            return None
+        
+        key_columns, key_values = self._resolve_key_or_default(table, record_id, current_state)
+        
+        # Agregar los valores de la clave al final para el WHERE
+        return tuple(columns), key_columns, values + key_values
+
+    def _resolve_key_or_default(self, table: str, record_id: Any,
+                                current_state: Dict[str, Any]) -> Tuple[Tuple[str, ...], List[Any]]:
+        """Clave del registro según el catálogo o, si la tabla no figura, la columna ID deducida"""
+        resolved = self.resolve_key(table, record_id, current_state)
+        if resolved:
+            return resolved
+
+        if table not in self._warned_tables:
+            logger.warning(f"Tabla {table} sin clave primaria/única en el catálogo; se deduce la columna ID")
+            self._warned_tables.add(table)
+        # Identificar columna ID basada en el patrón común (tabla_id)
+        id_column = None
+        for col, value in current_state.items():
+            if not col.startswith('_') and col.endswith('_id') and value == record_id:
+                id_column = col
+                break
+        
+        if not id_column:
+            # Si no hay patrón claro, asumimos que la tabla tiene una columna primary key estándar
+            id_column = f"{table}_id"
+        return (id_column,), [record_id]
+
+    def _get_statement(self, table: str, columns: Tuple[str, ...], key_columns: Tuple[str, ...],
+                       mode: str, rows_count: int = 1) -> str:
+        """Devuelve la sentencia de un grupo, armada una sola vez por combinación"""
+        cache_key = (table, columns, key_columns, mode, rows_count)
+        statement = self._statements.get(cache_key)
+        if statement is None:
+            if mode == 'upsert':
+                row_placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+                update_clause = ", ".join([f"`{col}`=VALUES(`{col}`)" for col in columns])
+                statement = (f"INSERT INTO `{table}` ({', '.join(f'`{col}`' for col in columns)}) VALUES "
+                             + ", ".join([row_placeholders] * rows_count)
+                             + f" ON DUPLICATE KEY UPDATE {update_clause}")
+            else:
+                set_clause = ", ".join([f"`{col}`=%s" for col in columns])
+                where_clause = " AND ".join([f"`{col}` = %s" for col in key_columns])
+                statement = f"UPDATE `{table}` SET {set_clause} WHERE {where_clause}"
+            self._statements[cache_key] = statement
+        return statement
+
+    def _apply_update_group(self, conn: MySQLConnection, cursor, table: str, columns: Tuple[str, ...],
+                            key_columns: Tuple[str, ...], rows: List[List[Any]]):
+        """Aplica un grupo de actualizaciones de una tabla con el mismo conjunto de columnas"""
         try:
-            # Obtener todas las columnas del estado actual
-            columns = []
-            values = []
+            if self.apply_mode == 'upsert' and set(key_columns) <= set(columns):
+                query = self._get_statement(table, columns, key_columns, 'upsert', len(rows))
+                conn.cursor.execute(query, [value for values in rows for value in values[:len(columns)]])
+            else:
+                query = self._get_statement(table, columns, key_columns, 'update')
+                cursor.executemany(query, rows)
             
-            # Filtramos los campos que no son parte de la tabla (como _id de MongoDB)
-            for key, value in current_state.items():
-                if not key.startswith('_'):
-                    columns.append(key)
-                    values.append(value)
+            self.stats['updates_applied'] += len(rows)
+            logger.info(f"Actualizados {len(rows)} registros en tabla {table}")
             
-            if not columns:
-                logger.warning(f"No hay columnas para actualizar en la tabla {table}, registro {record_id}")
+        except Error as e:
+            if len(rows) == 1:
+                logger.error(f"Error actualizando registro {rows[0][len(columns):]} en tabla {table}: {e}")
+                self.stats['errors'] += 1
                 return
-            
-            # Construir query de actualización
-            set_clause = ", ".join([f"`{col}`=%s" for col in columns])
-            
-            # Identificar columna ID basada en el patrón común (tabla_id)
-            id_column = None
-            for col in columns:
-                if col.endswith('_id') and current_state.get(col) == record_id:
-                    id_column = col
-                    break
-            
-            if not id_column:
-                # Si no hay patrón claro, asumimos que la tabla tiene una columna primary key estándar
-                id_column = f"{table}_id"
-            
-            query = f"UPDATE `{table}` SET {set_clause} WHERE `{id_column}` = %s"
-            
-            # Agregar el valor del ID al final para el WHERE
-            values.append(record_id)
-            
-            # Ejecutar la actualización
-            conn.cursor.execute(query, values)
-            conn.connection.commit()
-            
-            self.stats['updates_applied'] += 1
-            logger.info(f"Actualizado registro {record_id} en tabla {table}")
-            
+            # Reintentar registro por registro para aislar los que fallan
+            for values in rows:
+                self._apply_update_group(conn, cursor, table, columns, key_columns, [values])
+
+    def _apply_delete_batch(self, conn: MySQLConnection, table: str, key_columns: Tuple[str, ...],
+                            keys: List[List[Any]]):
+        """Borra un lote de registros de una tabla con un único DELETE ... WHERE clave IN (...)"""
+        if len(key_columns) == 1:
+            target = f"`{key_columns[0]}`"
+            placeholders = ", ".join(["%s"] * len(keys))
+        else:
+            target = "(" + ", ".join(f"`{col}`" for col in key_columns) + ")"
+            row_placeholders = "(" + ", ".join(["%s"] * len(key_columns)) + ")"
+            placeholders = ", ".join([row_placeholders] * len(keys))
+        try:
+            conn.cursor.execute(f"DELETE FROM `{table}` WHERE {target} IN ({placeholders})",
+                                [value for key_values in keys for value in key_values])
+            self.stats['deletes_applied'] += len(keys)
+            logger.info(f"Eliminados {conn.cursor.rowcount} registros de {len(keys)} en tabla {table}")
+
         except Error as e:
-            logger.error(f"Error actualizando registro {record_id} en tabla {table}: {e}")
-            self.stats['errors'] += 1
-            # No hacemos rollback, continuamos con los siguientes cambios
+            if len(keys) == 1:
+                logger.error(f"Error eliminando registro {keys[0]} en tabla {table}: {e}")
+                self.stats['errors'] += 1
+                return
+            # Bisectar el lote para aislar los registros que fallan (p. ej. hijos aún presentes)
+            middle = len(keys) // 2
+            self._apply_delete_batch(conn, table, key_columns, keys[:middle])
+            self._apply_delete_batch(conn, table, key_columns, keys[middle:])
+
+class SyncPlanner:
+    """
+    Estima el trabajo pendiente de cada tabla antes de sincronizar: filas nuevas según el rango
+    remoto MIN/MAX del campo de referencia frente a la marca de agua local, y bytes según
+    TABLE_ROWS y AVG_ROW_LENGTH de INFORMATION_SCHEMA.TABLES. Con esas estimaciones ordena
+    cada nivel de dependencias de mayor a menor costo (LPT) para equilibrar los workers.
+    """
+    def __init__(self, database: str, remote_conn: MySQLConnection, local_conn: MySQLConnection,
+                 schema: Dict[str, Dict[str, Any]], mongo_logger: Optional[MongoLogger] = None):
+        self.database = database
+        self.remote_conn = remote_conn
+        self.local_conn = local_conn
+        self.schema = schema
+        self.mongo_logger = mongo_logger
+        # Velocidad supuesta para tablas sin historial de tiempos en sync_history
+        self.bytes_per_second = float(os.getenv("SYNC_PLAN_BYTES_PER_SECOND", str(5 * 1024 * 1024)))
+        self.history_days = float(os.getenv("SYNC_PLAN_HISTORY_DAYS", "7"))
+
+    @staticmethod
+    def get_table_sizes(conn: MySQLConnection) -> Dict[str, Tuple[int, int]]:
+        """Filas estimadas y largo promedio de fila de cada tabla, desde INFORMATION_SCHEMA"""
+        conn.cursor.execute("""
+            SELECT TABLE_NAME, TABLE_ROWS, AVG_ROW_LENGTH
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+        """)
+        return {as_str(row['TABLE_NAME']): (int(row['TABLE_ROWS'] or 0), int(row['AVG_ROW_LENGTH'] or 0))
+                for row in conn.cursor.fetchall()}
+
+    def get_history_speeds(self) -> Dict[str, float]:
+        """Mediana de filas/s de cada tabla en las sincronizaciones registradas recientemente"""
+        if not self.mongo_logger:
+            return {}
+        since = datetime.now() - timedelta(days=self.history_days)
+        speeds = defaultdict(list)
+        for entry in self.mongo_logger.get_table_timings(since, self.database):
+            speed = entry['stats'].get('rows_per_second', 0.0)
+            if speed > 0:
+                speeds[entry['table']].append(speed)
+        return {table: percentile(values, 0.5) for table, values in speeds.items()}
+
+    def is_indexed(self, table: str, column: str) -> bool:
+        """MIN/MAX solo se consultan si el campo encabeza un índice (lectura de un extremo del índice)"""
+        return any(index['columns'][0] == column for index in self.schema.get(table, {}).get('indexes', []))
+
+    def get_local_watermark(self, table_info: Dict[str, Any]) -> Any:
+        """Marca de agua local sin modificar el estado (a diferencia de TableSync.get_watermark)"""
+        try:
+            entry = SyncState(self.local_conn).get(f"table:{table_info['name']}")
+        except Error:
+            entry = None
+        if entry and as_str(entry['reference_field']) == table_info['reference_field']:
+            return entry['value']
+        self.local_conn.cursor.execute(
+            f"SELECT MAX(`{table_info['reference_field']}`) AS max_value FROM `{table_info['name']}`")
+        row = self.local_conn.cursor.fetchone()
+        return row['max_value'] if row else None
+
+    def get_remote_range(self, table: str, reference_field: str) -> Tuple[Any, Any]:
+        self.remote_conn.cursor.execute(
+            f"SELECT MIN(`{reference_field}`) AS min_value, MAX(`{reference_field}`) AS max_value FROM `{table}`")
+        row = self.remote_conn.cursor.fetchone()
+        return (row['min_value'], row['max_value']) if row else (None, None)
+
+    @staticmethod
+    def _position(value: Any) -> Optional[float]:
+        """Posición numérica de un valor de referencia para interpolar el rango pendiente"""
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if isinstance(value, date):
+            return float(value.toordinal())
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            return float(value)
+        return None
+
+    def estimate_rows(self, table_info: Dict[str, Any], remote_rows: int, local_rows: int) -> Tuple[int, str]:
+        """Filas pendientes estimadas de una tabla y el método usado para estimarlas"""
+        table, reference_field = table_info['name'], table_info['reference_field']
+        watermark = self.get_local_watermark(table_info)
+        if watermark is None:
+            return remote_rows, 'full'
+        if not self.is_indexed(table, reference_field):
+            return max(0, remote_rows - local_rows), 'table_rows'
+
+        low, high = self.get_remote_range(table, reference_field)
+        if high is None:
+            return 0, 'range'
+        positions = [self._position(value) for value in (low, high, watermark)]
+        if None in positions:
+            return max(0, remote_rows - local_rows), 'table_rows'
+        low_pos, high_pos, watermark_pos = positions
+        if high_pos <= watermark_pos:
+            return 0, 'range'
+        if high_pos <= low_pos or watermark_pos < low_pos:
+            return max(1, remote_rows), 'range'
+        # Se asume densidad uniforme de filas a lo largo del rango del campo de referencia
+        fraction = (high_pos - watermark_pos) / (high_pos - low_pos)
+        return max(1, int(round(remote_rows * fraction))), 'range'
+
+    def plan(self, tables_info: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Devuelve por tabla las filas, bytes y segundos estimados de la próxima sincronización"""
+        remote_sizes = self.get_table_sizes(self.remote_conn)
+        local_sizes = self.get_table_sizes(self.local_conn)
+        speeds = self.get_history_speeds()
+
+        plan = {}
+        for table_info in tables_info:
+            table = table_info['name']
+            remote_rows, avg_row_length = remote_sizes.get(table, (0, 0))
+            rows, method = self.estimate_rows(table_info, remote_rows, local_sizes.get(table, (0, 0))[0])
+            estimated_bytes = rows * avg_row_length
+            if table in speeds:
+                seconds = rows / speeds[table]
+            else:
+                seconds = estimated_bytes / self.bytes_per_second
+            plan[table] = {'rows': rows, 'bytes': estimated_bytes, 'seconds': seconds, 'method': method}
+        return plan
+
+    @staticmethod
+    def order_level(level: List[Dict[str, Any]], plan: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Ordena un nivel de mayor a menor costo: el pool toma las tareas en orden (LPT)"""
+        return sorted(level, key=lambda info: plan.get(info['name'], {}).get('seconds', 0.0), reverse=True)
+
+    @staticmethod
+    def assign_workers(level: List[Dict[str, Any]], plan: Dict[str, Dict[str, Any]],
+                       workers: int) -> List[Tuple[float, List[str]]]:
+        """Simula la asignación LPT de un nivel: cada tabla va al worker menos cargado"""
+        loads = [(0.0, index, []) for index in range(max(1, workers))]
+        heapq.heapify(loads)
+        for info in SyncPlanner.order_level(level, plan):
+            load, index, tables = heapq.heappop(loads)
+            tables.append(info['name'])
+            heapq.heappush(loads, (load + plan.get(info['name'], {}).get('seconds', 0.0), index, tables))
+        return [(load, tables) for load, index, tables in sorted(loads, key=lambda item: item[1])]
 
 class DatabaseSync:
-    def __init__(self, database: str):
+    def __init__(self, database: str, max_workers: Optional[int] = None,
+                 mongo_logger: Optional[MongoLogger] = None,
+                 changelog_client: Optional[MongoClient] = None,
+                 limiter: Optional[HostConnectionLimiter] = None,
+                 throttle: Optional[RemoteThrottle] = None):
         self.database = database
+        # Cantidad de tablas sincronizadas en paralelo dentro de cada nivel de dependencias
+        self.max_workers = max_workers or int(os.getenv("SYNC_TABLE_WORKERS", "4"))
+        self._stats_lock = threading.Lock()
         self.remote_config = DatabaseConfig("DBR")
         self.local_config = DatabaseConfig("DB")
-        self.mongo_logger = MongoLogger()
+        # Los clientes MongoDB y el limitador de conexiones pueden compartirse entre bases
+        self.mongo_logger = mongo_logger or MongoLogger()
+        self.changelog_client = changelog_client
+        self.limiter = limiter
+        self.throttle = throttle
         self.sync_stats = {
             'tables_processed': 0,
             'tables_success': 0,
@@ -346,7 +1837,15 @@ class DatabaseSync:
             'total_rows_processed': 0,
             'total_rows_inserted': 0,
             'total_updates_processed': 0,
+            'total_updates_coalesced': 0,
             'total_updates_applied': 0,
+            'total_deletes_applied': 0,
+            'fetch_stall_seconds': 0.0,
+            'insert_stall_seconds': 0.0,
+            'bytes_transferred': 0,
+            # Segundos por fase: schema_analysis y changelog_apply de la base, más la suma
+            # de las fases de sus tablas
+            'timings': {},
             'errors': 0
         }
 
@@ -354,47 +1853,57 @@ class DatabaseSync:
         """Sincroniza una base de datos completa"""
         logger.info(f"Iniciando sincronización de base de datos: {self.database}")
         
+        # Reservar cupo de conexiones en los hosts remoto y local
+        hosts = [self.remote_config.host_key, self.local_config.host_key]
+        reserved = self.limiter.acquire(hosts, self.max_workers) if self.limiter else self.max_workers
+        remote_pool = local_pool = None
         try:
             # Primero analizar estructura usando la base local
-            with MySQLConnection(self.local_config, self.database) as local_conn:
+            with MySQLConnection(self.local_config, self.database) as local_conn, \
+                 timed(self.sync_stats['timings'], 'schema_analysis'):
+                SyncState(local_conn).ensure_table()
                 analyzer = TableAnalyzer(local_conn)
                 tables_info = analyzer.analyze_tables()
+                key_catalog = analyzer.get_key_catalog()
+                schema = analyzer.get_schema()
             
-            # Procesar cada tabla en orden
-            with MySQLConnection(self.remote_config, self.database) as remote_conn, \
-                 MySQLConnection(self.local_config, self.database) as local_conn:
-                
-                # Primero sincronizar inserciones nuevas
-                for table_info in tables_info:
-                    try:
-                        table_sync = TableSync(remote_conn, local_conn, table_info, self.mongo_logger)
-                        table_sync.sync_table()
-                        
-                        # Actualizar estadísticas
-                        self.sync_stats['tables_success'] += 1
-                        self.sync_stats['total_rows_processed'] += table_sync.stats['rows_processed']
-                        self.sync_stats['total_rows_inserted'] += table_sync.stats['rows_inserted']
-                        self.sync_stats['errors'] += table_sync.stats['errors']
-                    except Error as e:
-                        logger.error(f"Error en tabla {table_info['name']}: {e}")
-                        self.sync_stats['tables_failed'] += 1
-                    finally:
-                        self.sync_stats['tables_processed'] += 1
-                        
+            # Agrupar tablas por niveles de dependencia (claves foráneas)
+            levels = build_dependency_levels(tables_info)
+            workers = max(1, min(reserved, max((len(level) for level in levels), default=1)))
+            allow_local_infile = os.getenv("SYNC_INSERT_MODE", "batch") == "load_data"
+            remote_pool = ConnectionPool(self.remote_config, self.database, workers)
+            local_pool = ConnectionPool(self.local_config, self.database, workers, allow_local_infile)
+            plan = self._plan(tables_info, schema, remote_pool, local_pool)
+
+            # Primero sincronizar inserciones nuevas: cada nivel en paralelo, los niveles en orden;
+            # dentro de un nivel, las tablas más costosas se envían primero (LPT)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for level in levels:
+                    futures = [executor.submit(self._sync_table, table_info, remote_pool, local_pool)
+                               for table_info in SyncPlanner.order_level(level, plan)]
+                    wait(futures)
+                    for future in futures:
+                        future.result()
+
+            with MySQLConnection(self.local_config, self.database, pool=local_pool) as local_conn:
                 # Ahora procesar actualizaciones desde el changelog de MongoDB
                 try:
-                    changelog_sync = ChangelogSynchronizer(self.database)
-                    recent_changes = changelog_sync.get_recent_changes()
+                    changelog_sync = ChangelogSynchronizer(self.database, self.changelog_client,
+                                                           key_catalog=key_catalog)
+                    with timed(self.sync_stats['timings'], 'changelog_apply'):
+                        changelog_sync.consume(local_conn)
                     
-                    if recent_changes:
-                        changelog_sync.apply_changes_to_local(recent_changes, local_conn)
-                        
+                    if changelog_sync.stats['updates_processed']:
                         # Actualizar estadísticas
                         self.sync_stats['total_updates_processed'] += changelog_sync.stats['updates_processed']
+                        self.sync_stats['total_updates_coalesced'] += changelog_sync.stats['updates_coalesced']
                         self.sync_stats['total_updates_applied'] += changelog_sync.stats['updates_applied']
+                        self.sync_stats['total_deletes_applied'] += changelog_sync.stats['deletes_applied']
                         self.sync_stats['errors'] += changelog_sync.stats['errors']
                         
-                        logger.info(f"Aplicados {changelog_sync.stats['updates_applied']} cambios de {changelog_sync.stats['updates_processed']} del changelog")
+                        logger.info(f"Aplicados {changelog_sync.stats['updates_applied']} cambios de {changelog_sync.stats['updates_processed']} del changelog "
+                                    f"({changelog_sync.stats['updates_coalesced']} colapsados, "
+                                    f"{changelog_sync.stats['deletes_applied']} borrados)")
                 except Exception as e:
                     logger.error(f"Error procesando changelog para {self.database}: {e}")
                     self.sync_stats['errors'] += 1
@@ -406,9 +1915,70 @@ class DatabaseSync:
         except Error as e:
             logger.error(f"Error sincronizando base de datos {self.database}: {e}")
             raise
+        finally:
+            for pool in (remote_pool, local_pool):
+                if pool:
+                    pool.close()
+            if self.limiter:
+                self.limiter.release(hosts, reserved)
+
+    def _plan(self, tables_info: List[Dict[str, Any]], schema: Dict[str, Dict[str, Any]],
+              remote_pool: ConnectionPool, local_pool: ConnectionPool) -> Dict[str, Dict[str, Any]]:
+        """Estima el costo de cada tabla; sin plan (SYNC_PLANNER=0 o error) se conserva el orden"""
+        if os.getenv("SYNC_PLANNER", "1") != "1":
+            return {}
+        try:
+            with MySQLConnection(self.remote_config, self.database, pool=remote_pool) as remote_conn, \
+                 MySQLConnection(self.local_config, self.database, pool=local_pool) as local_conn, \
+                 timed(self.sync_stats['timings'], 'planning'):
+                planner = SyncPlanner(self.database, remote_conn, local_conn, schema, self.mongo_logger)
+                return planner.plan(tables_info)
+        except Exception as e:
+            logger.warning(f"No se pudo estimar el plan de {self.database}: {e}")
+            return {}
+
+    def _sync_table(self, table_info: Dict[str, Any], remote_pool: ConnectionPool, local_pool: ConnectionPool):
+        """Sincroniza una tabla con conexiones propias obtenidas de los pools"""
+        table_sync = None
+        try:
+            # Con el regulador activo, la concurrencia contra el remoto baja si está ocupado
+            slot = self.throttle.slot(remote_pool.pool.pool_size, self.database) if self.throttle else nullcontext()
+            with slot, \
+                 MySQLConnection(self.remote_config, self.database, pool=remote_pool) as remote_conn, \
+                 MySQLConnection(self.local_config, self.database, pool=local_pool) as local_conn:
+                table_sync = TableSync(remote_conn, local_conn, table_info, self.mongo_logger,
+                                       throttle=self.throttle, limiter=self.limiter)
+                table_sync.sync_table()
+
+            # Actualizar estadísticas
+            with self._stats_lock:
+                self.sync_stats['tables_success'] += 1
+                self.sync_stats['total_rows_processed'] += table_sync.stats['rows_processed']
+                self.sync_stats['total_rows_inserted'] += table_sync.stats['rows_inserted']
+                self.sync_stats['errors'] += table_sync.stats['errors']
+                self.sync_stats['fetch_stall_seconds'] += table_sync.stats['fetch_stall_seconds']
+                self.sync_stats['insert_stall_seconds'] += table_sync.stats['insert_stall_seconds']
+                self.sync_stats['bytes_transferred'] += table_sync.stats['bytes_transferred']
+                for phase, seconds in table_sync.stats['timings'].items():
+                    self.sync_stats['timings'][phase] = self.sync_stats['timings'].get(phase, 0.0) + seconds
+        except Error as e:
+            logger.error(f"Error en tabla {table_info['name']}: {e}")
+            with self._stats_lock:
+                self.sync_stats['tables_failed'] += 1
+            if table_sync:
+                table_sync.stats['errors'] += 1
+        finally:
+            with self._stats_lock:
+                self.sync_stats['tables_processed'] += 1
+            if table_sync:
+                try:
+                    self.mongo_logger.log_table_result(self.database, table_info['name'], table_sync.stats)
+                except Exception as e:
+                    logger.error(f"Error registrando tiempos de {table_info['name']}: {e}")
 
     def _generate_report(self):
         """Genera reporte de sincronización"""
+        timings = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.sync_stats['timings'].items())
         report = f"""
         Reporte de Sincronización - {self.database}
         ======================================
@@ -418,13 +1988,357 @@ class DatabaseSync:
         Total de filas procesadas: {self.sync_stats['total_rows_processed']}
         Total de filas insertadas: {self.sync_stats['total_rows_inserted']}
         Total de cambios procesados: {self.sync_stats['total_updates_processed']}
+        Total de cambios colapsados: {self.sync_stats['total_updates_coalesced']}
         Total de cambios aplicados: {self.sync_stats['total_updates_applied']}
+        Total de borrados aplicados: {self.sync_stats['total_deletes_applied']}
+        Espera de lectura remota (cola llena): {self.sync_stats['fetch_stall_seconds']:.2f}s
+        Espera de escritura local (cola vacía): {self.sync_stats['insert_stall_seconds']:.2f}s
+        Bytes transferidos (estimados): {self.sync_stats['bytes_transferred']}
+        Tiempo por fase: {timings}
         Errores encontrados: {self.sync_stats['errors']}
         """
         logger.info(report)
 
+class SyncDaemon:
+    """
+    Sincronización continua: mantiene abiertas las conexiones y los metadatos de esquema de
+    cada base, y consulta cada tabla (y el changelog) con un intervalo que se adapta a su
+    ritmo de cambios: las tablas con novedades se consultan cada pocos segundos y las
+    inactivas se espacian progresivamente hasta el intervalo máximo.
+    """
+    SCHEMA_TASK = "__schema__"
+    CHANGELOG_TASK = "__changelog__"
+
+    def __init__(self, databases: List[str], mongo_logger: MongoLogger, changelog_client: MongoClient,
+                 throttle: Optional[RemoteThrottle] = None):
+        self.databases = databases
+        self.throttle = throttle
+        self.mongo_logger = mongo_logger
+        self.changelog_client = changelog_client
+        self.remote_config = DatabaseConfig("DBR")
+        self.local_config = DatabaseConfig("DB")
+        self.min_interval = float(os.getenv("SYNC_DAEMON_MIN_INTERVAL", "2"))
+        self.max_interval = float(os.getenv("SYNC_DAEMON_MAX_INTERVAL", "300"))
+        self.backoff = float(os.getenv("SYNC_DAEMON_BACKOFF", "1.5"))
+        self.schema_refresh = float(os.getenv("SYNC_DAEMON_SCHEMA_REFRESH", "600"))
+        self.report_interval = float(os.getenv("SYNC_DAEMON_REPORT_INTERVAL", "300"))
+        self.running = True
+        self.states = {}
+        self.schedule = []
+        self.scheduled = set()
+        # Tarea en ejecución: ya salió de la cola y la vuelve a programar _reschedule
+        self.current_task = None
+        self.intervals = {}
+        self._sequence = itertools.count()
+        self._last_report = time.monotonic()
+
+    def stop(self, *args):
+        logger.info("Deteniendo el daemon de sincronización")
+        self.running = False
+
+    def _new_stats(self) -> Dict[str, Any]:
+        return {
+            'tables_processed': 0,
+            'total_rows_processed': 0,
+            'total_rows_inserted': 0,
+            'total_updates_processed': 0,
+            'total_updates_coalesced': 0,
+            'total_updates_applied': 0,
+            'total_deletes_applied': 0,
+            'errors': 0
+        }
+
+    def _connect(self, database: str) -> Dict[str, Any]:
+        """Devuelve el estado abierto de una base, conectando y analizando su esquema si hace falta"""
+        state = self.states.get(database)
+        if state:
+            return state
+
+        allow_local_infile = os.getenv("SYNC_INSERT_MODE", "batch") == "load_data"
+        remote_conn = MySQLConnection(self.remote_config, database)
+        local_conn = MySQLConnection(self.local_config, database, allow_local_infile)
+        remote_conn.connect()
+        try:
+            local_conn.connect()
+        except Error:
+            remote_conn.close()
+            raise
+        # Sin autocommit, una conexión persistente seguiría viendo la misma instantánea del remoto
+        remote_conn.connection.autocommit = True
+        SyncState(local_conn).ensure_table()
+
+        state = {
+            'remote': remote_conn,
+            'local': local_conn,
+            'analyzer': TableAnalyzer(local_conn),
+            'tables': {},
+            'ancestors': {},
+            'changelog': None,
+            'stats': self._new_stats()
+        }
+        self.states[database] = state
+        self._load_schema(database, state, refresh=False)
+        return state
+
+    def _disconnect(self, database: str):
+        state = self.states.pop(database, None)
+        if state:
+            for conn in (state['remote'], state['local']):
+                try:
+                    conn.close()
+                except Error:
+                    pass
+            self._report(database, state)
+
+    def _load_schema(self, database: str, state: Dict[str, Any], refresh: bool = True):
+        """Carga (o verifica por huella) el esquema y programa las tablas nuevas"""
+        analyzer = state['analyzer']
+        if refresh:
+            analyzer.get_schema(refresh=True)
+        tables_info = analyzer.analyze_tables()
+        levels = build_dependency_levels(tables_info)
+        order = {info['name']: index for index, level in enumerate(levels) for info in level}
+        tables = {info['name']: info for info in tables_info}
+
+        # Antes de cada tabla se sincronizan sus tablas referenciadas, para no insertar huérfanos
+        ancestors = {}
+        for name in tables:
+            found, pending = set(), list(tables[name]['depends_on'])
+            while pending:
+                parent = pending.pop()
+                if parent in tables and parent != name and parent not in found:
+                    found.add(parent)
+                    pending.extend(tables[parent]['depends_on'])
+            ancestors[name] = sorted(found, key=lambda parent: order[parent])
+
+        state['tables'] = tables
+        state['ancestors'] = ancestors
+        state['changelog'] = ChangelogSynchronizer(database, self.changelog_client,
+                                                   key_catalog=analyzer.get_key_catalog())
+        for task in list(tables) + [self.CHANGELOG_TASK]:
+            if (database, task) != self.current_task:
+                self._push(database, task, 0)
+
+    def _push(self, database: str, task: str, delay: float):
+        """Programa una tarea; cada (base, tarea) está a lo sumo una vez en la cola"""
+        if (database, task) in self.scheduled:
+            return
+        self.scheduled.add((database, task))
+        heapq.heappush(self.schedule, (time.monotonic() + delay, next(self._sequence), database, task))
+
+    def _reschedule(self, database: str, task: str, changed: bool):
+        """Vuelve a programar una tarea: al intervalo mínimo si hubo cambios, con retroceso si no"""
+        key = (database, task)
+        interval = self.intervals.get(key, self.min_interval)
+        interval = self.min_interval if changed else min(self.max_interval, interval * self.backoff)
+        self.intervals[key] = interval
+        self._push(database, task, interval)
+
+    def _run_task(self, database: str, task: str):
+        if task == self.SCHEMA_TASK:
+            try:
+                state = self.states.get(database)
+                if state:
+                    self._load_schema(database, state)
+                else:
+                    self._connect(database)
+            except Error as e:
+                logger.error(f"Error analizando esquema de {database}: {e}")
+                self._disconnect(database)
+            self._push(database, task, self.schema_refresh)
+            return
+
+        changed = False
+        try:
+            state = self._connect(database)
+            stats = state['stats']
+            if task == self.CHANGELOG_TASK:
+                changelog_sync = state['changelog']
+                before = dict(changelog_sync.stats)
+                changelog_sync.consume(state['local'])
+                processed = changelog_sync.stats['updates_processed'] - before['updates_processed']
+                stats['total_updates_processed'] += processed
+                stats['total_updates_coalesced'] += changelog_sync.stats['updates_coalesced'] - before['updates_coalesced']
+                stats['total_updates_applied'] += changelog_sync.stats['updates_applied'] - before['updates_applied']
+                stats['total_deletes_applied'] += changelog_sync.stats['deletes_applied'] - before['deletes_applied']
+                stats['errors'] += changelog_sync.stats['errors'] - before['errors']
+                changed = processed > 0
+            elif task in state['tables']:
+                for name in state['ancestors'][task] + [task]:
+                    table_sync = TableSync(state['remote'], state['local'], state['tables'][name],
+                                           self.mongo_logger, throttle=self.throttle)
+                    try:
+                        table_sync.sync_table()
+                    finally:
+                        self.mongo_logger.log_table_result(database, name, table_sync.stats)
+                    stats['tables_processed'] += 1
+                    stats['total_rows_processed'] += table_sync.stats['rows_processed']
+                    stats['total_rows_inserted'] += table_sync.stats['rows_inserted']
+                    stats['errors'] += table_sync.stats['errors']
+                    if name == task:
+                        changed = table_sync.stats['rows_processed'] > 0
+            else:
+                # La tabla ya no existe en el esquema: se deja de programar
+                self.scheduled.discard((database, task))
+                return
+            # Cerrar la transacción de lectura local entre consultas
+            state['local'].connection.commit()
+        except Error as e:
+            logger.error(f"Error sincronizando {database}.{task}: {e}")
+            if database in self.states:
+                self.states[database]['stats']['errors'] += 1
+            self._disconnect(database)
+        except Exception as e:
+            logger.error(f"Error procesando {database}.{task}: {e}")
+        self._reschedule(database, task, changed)
+
+    def _report(self, database: str, state: Dict[str, Any]):
+        """Registra en MongoDB los contadores acumulados de una base y los reinicia"""
+        stats = state['stats']
+        if stats['tables_processed'] or stats['total_updates_processed'] or stats['errors']:
+            self.mongo_logger.log_sync_result(database, stats)
+        state['stats'] = self._new_stats()
+
+    def run(self):
+        """Bucle principal del daemon hasta recibir SIGINT/SIGTERM"""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info(f"Daemon de sincronización iniciado para: {', '.join(self.databases)}")
+
+        for database in self.databases:
+            self._push(database, self.SCHEMA_TASK, 0)
+
+        try:
+            while self.running:
+                due, _, database, task = self.schedule[0]
+                wait_seconds = due - time.monotonic()
+                if wait_seconds > 0:
+                    time.sleep(min(wait_seconds, 1.0))
+                else:
+                    heapq.heappop(self.schedule)
+                    self.scheduled.discard((database, task))
+                    self.current_task = (database, task)
+                    try:
+                        self._run_task(database, task)
+                    finally:
+                        self.current_task = None
+
+                if time.monotonic() - self._last_report >= self.report_interval:
+                    for database, state in list(self.states.items()):
+                        self._report(database, state)
+                    self._last_report = time.monotonic()
+        finally:
+            for database in list(self.states):
+                self._disconnect(database)
+
+def run_database_sync(database: str, mongo_logger: MongoLogger, changelog_client: MongoClient,
+                      limiter: HostConnectionLimiter, throttle: Optional[RemoteThrottle] = None) -> Dict[str, Any]:
+    """Sincroniza una base de datos y devuelve su resultado junto con el tiempo empleado"""
+    started = time.monotonic()
+    result = {'database': database, 'status': 'ok', 'stats': None}
+    try:
+        sync = DatabaseSync(database, mongo_logger=mongo_logger, changelog_client=changelog_client,
+                            limiter=limiter, throttle=throttle)
+        sync.sync_database()
+        result['stats'] = sync.sync_stats
+    except Exception as e:
+        logger.error(f"Error procesando base de datos {database}: {e}")
+        result['status'] = 'error'
+    result['seconds'] = time.monotonic() - started
+    return result
+
+def generate_run_report(results: List[Dict[str, Any]], wall_seconds: float):
+    """Genera el reporte combinado de una ejecución sobre varias bases de datos"""
+    lines = [f"        {r['database']}: {r['seconds']:.2f}s ({r['status']})" for r in results]
+    report = f"""
+        Reporte de Ejecución
+        ======================================
+        Bases de datos: {len(results)}
+        Bases con error: {sum(1 for r in results if r['status'] != 'ok')}
+        Tiempo total (reloj): {wall_seconds:.2f}s
+        Tiempo acumulado por base: {sum(r['seconds'] for r in results):.2f}s
+        Tiempo por base de datos:
+{chr(10).join(lines)}
+        """
+    logger.info(report)
+
+def print_timings_report(mongo_logger: MongoLogger, days: float):
+    """Imprime p50/p95 de duración, velocidad y fases por tabla a partir de sync_history"""
+    since = datetime.now() - timedelta(days=days)
+    runs = defaultdict(list)
+    for entry in mongo_logger.get_table_timings(since):
+        runs[(entry['database'], entry['table'])].append(entry['stats'])
+    if not runs:
+        print(f"Sin registros de tablas en los últimos {days:g} días")
+        return
+
+    phases = ['watermark', 'fetch', 'insert', 'commit']
+    header = (f"{'tabla':<40} {'ejec':>5} {'p50 s':>9} {'p95 s':>9} {'p50 filas/s':>12} "
+              + " ".join(f"{'p95 ' + phase:>14}" for phase in phases))
+    print(header)
+    print("-" * len(header))
+    # Primero las tablas más lentas (p95 de duración total)
+    summary = []
+    for (database, table), stats_list in runs.items():
+        elapsed = [stats.get('elapsed_seconds', 0.0) for stats in stats_list]
+        summary.append((percentile(elapsed, 0.95), database, table, stats_list, elapsed))
+    for p95, database, table, stats_list, elapsed in sorted(summary, key=lambda item: item[0], reverse=True):
+        speed = [stats.get('rows_per_second', 0.0) for stats in stats_list]
+        phase_p95 = [percentile([stats.get('timings', {}).get(phase, 0.0) for stats in stats_list], 0.95)
+                     for phase in phases]
+        print(f"{database + '.' + table:<40} {len(stats_list):>5} {percentile(elapsed, 0.5):>9.2f} {p95:>9.2f} "
+              f"{percentile(speed, 0.5):>12.0f} " + " ".join(f"{seconds:>14.2f}" for seconds in phase_p95))
+
+def print_sync_plan(database: str, mongo_logger: MongoLogger):
+    """Imprime el plan estimado de una base sin sincronizar (--plan)"""
+    with MySQLConnection(DatabaseConfig("DBR"), database) as remote_conn, \
+         MySQLConnection(DatabaseConfig("DB"), database) as local_conn:
+        analyzer = TableAnalyzer(local_conn)
+        tables_info = analyzer.analyze_tables()
+        plan = SyncPlanner(database, remote_conn, local_conn, analyzer.get_schema(), mongo_logger).plan(tables_info)
+
+    levels = build_dependency_levels(tables_info)
+    workers = max(1, min(int(os.getenv("SYNC_TABLE_WORKERS", "4")), max((len(level) for level in levels), default=1)))
+    print(f"Plan de sincronización - {database} ({workers} workers)")
+    total_seconds = 0.0
+    for number, level in enumerate(levels, start=1):
+        assignment = SyncPlanner.assign_workers(level, plan, workers)
+        worker_of = {table: index for index, (load, tables) in enumerate(assignment, start=1) for table in tables}
+        level_seconds = max(load for load, tables in assignment)
+        total_seconds += level_seconds
+        print(f"  Nivel {number}: {len(level)} tablas, {level_seconds:.1f}s estimados")
+        for info in SyncPlanner.order_level(level, plan):
+            estimate = plan[info['name']]
+            print(f"    {info['name']:<40} {estimate['rows']:>12} filas {estimate['bytes'] / 1024 / 1024:>10.1f} MB "
+                  f"{estimate['seconds']:>9.1f}s  worker {worker_of[info['name']]}  ({estimate['method']})")
+    print(f"  Total: {sum(e['rows'] for e in plan.values())} filas, "
+          f"{sum(e['bytes'] for e in plan.values()) / 1024 / 1024:.1f} MB, {total_seconds:.1f}s estimados")
+
 def main():
     load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Sincroniza bases MySQL remotas hacia la instancia local."
+    )
+    parser.add_argument("--database-workers", type=int,
+                        default=int(os.getenv("SYNC_DATABASE_WORKERS", "1")),
+                        help="Bases de datos sincronizadas en paralelo (default: SYNC_DATABASE_WORKERS o 1)")
+    parser.add_argument("--max-connections-per-host", type=int,
+                        default=int(os.getenv("SYNC_MAX_CONNECTIONS_PER_HOST", "8")),
+                        help="Conexiones MySQL simultáneas por host (default: SYNC_MAX_CONNECTIONS_PER_HOST u 8)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Ejecuta en forma continua con conexiones persistentes y sondeo adaptativo")
+    parser.add_argument("--plan", action="store_true",
+                        help="Muestra filas, bytes y tiempo estimados por tabla y su asignación a workers, sin sincronizar")
+    parser.add_argument("--timings-report", action="store_true",
+                        help="Muestra p50/p95 de tiempos por tabla registrados en MongoDB y termina")
+    parser.add_argument("--days", type=float, default=7,
+                        help="Días considerados por --timings-report (default: 7)")
+    args = parser.parse_args()
+
+    if args.timings_report:
+        print_timings_report(MongoLogger(), args.days)
+        return
     
     try:
         databases = os.getenv("MYSQL_DATABASES")
@@ -433,13 +2347,39 @@ def main():
             sys.exit(1)
 
         databases_list = [db.strip() for db in databases.split(",") if db.strip()]
-        for db in databases_list:
+
+        if args.plan:
+            mongo_logger = MongoLogger()
+            for database in databases_list:
+                print_sync_plan(database, mongo_logger)
+            return
+
+        # Clientes MongoDB y limitador de conexiones compartidos por todas las bases
+        mongo_logger = MongoLogger()
+        changelog_client = create_changelog_client()
+
+        # Regulador de carga compartido: todas las bases leen del mismo servidor remoto
+        throttle = RemoteThrottle(DatabaseConfig("DBR"), mongo_logger) if os.getenv("SYNC_THROTTLE", "1") == "1" else None
+
+        if args.daemon:
             try:
-                sync = DatabaseSync(db)
-                sync.sync_database()
-            except Exception as e:
-                logger.error(f"Error procesando base de datos {db}: {e}")
-                continue
+                SyncDaemon(databases_list, mongo_logger, changelog_client, throttle).run()
+            finally:
+                if throttle:
+                    throttle.close()
+            return
+
+        limiter = HostConnectionLimiter(args.max_connections_per_host)
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, args.database_workers)) as executor:
+            results = list(executor.map(
+                lambda db: run_database_sync(db, mongo_logger, changelog_client, limiter, throttle),
+                databases_list
+            ))
+        if throttle:
+            throttle.close()
+        generate_run_report(results, time.monotonic() - started)
 
     except Exception as e:
         logger.error(f"Error general: {e}")